@@ -0,0 +1,139 @@
+import asyncio
+import collections
+import logging
+import threading
+import typing as tp
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.meetings import (
+    list_recordings,
+    trash_meeting_recording,
+    restore_meeting_recording,
+)
+from lectorium_zoom_pull.models import (
+    AccountsRecordingsRequest,
+    AccountsRecordingsResponse,
+    Meeting,
+)
+
+
+T = tp.TypeVar('T')
+R = tp.TypeVar('R')
+
+_EXHAUSTED = object()
+
+
+class AsyncZoomClient:
+    """asyncio front for control plane calls
+
+    Requests share the pooled session and rate limits of `meetings', at most
+    `concurrency' of them are in flight
+    """
+
+    def __init__(self, config: Config, concurrency: int):
+        self.config = config
+        self.concurrency = concurrency
+        if concurrency > config.http_pool_size:
+            logging.warning(
+                'Concurrency %d exceeds http_pool_size %d, '
+                'extra connections will not be kept alive',
+                concurrency, config.http_pool_size
+            )
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    async def _call(self, func: tp.Callable[..., R], *args) -> R:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, func, self.config, *args)
+
+    async def list_recordings(
+        self,
+        request: AccountsRecordingsRequest,
+    ) -> AccountsRecordingsResponse:
+        return await self._call(list_recordings, request)
+
+    async def trash_meeting_recording(self, meeting: Meeting) -> str:
+        return await self._call(trash_meeting_recording, meeting)
+
+    async def restore_meeting_recording(self, meeting: Meeting) -> str:
+        return await self._call(restore_meeting_recording, meeting)
+
+    async def map_ordered(
+        self,
+        func: tp.Callable[[T], tp.Awaitable[R]],
+        items: tp.Iterable[T],
+    ) -> tp.AsyncIterator[tp.Tuple[T, tp.Optional[R], tp.Optional[Exception]]]:
+        """Yields (item, result, error) in order of `items'
+
+        No more than `2 * concurrency' items are taken ahead of the consumer.
+        `items' may block, e.g. a paged listing, it is advanced in background.
+        If `items' raises or the consumer stops early, calls not yet
+        reported are cancelled and awaited before this generator exits
+        """
+        loop = asyncio.get_event_loop()
+        iterator = iter(items)
+        window = collections.deque()
+
+        async def settle(item: T):
+            try:
+                return item, await func(item), None
+            except Exception as e:
+                return item, None, e
+
+        try:
+            while True:
+                item = await loop.run_in_executor(
+                    None, next, iterator, _EXHAUSTED)
+                if item is _EXHAUSTED:
+                    break
+                window.append(asyncio.ensure_future(settle(item)))
+                if len(window) >= 2 * self.concurrency:
+                    yield await window.popleft()
+
+            while window:
+                yield await window.popleft()
+        finally:
+            for task in window:
+                task.cancel()
+            await asyncio.gather(*window, return_exceptions=True)
+
+
+def run_sync(coroutine: tp.Awaitable[R]) -> R:
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TrashStage:
+    """Trashes meetings on a background event loop
+
+    Meetings are accepted at any time from any thread, up to `concurrency'
+    trash calls run together with whatever the caller does meanwhile
+    """
+
+    def __init__(self, config: Config, concurrency: int):
+        self._client = AsyncZoomClient(config, concurrency)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name='trash-stage',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def submit(self, meeting: Meeting) -> Future:
+        """Return value: future of trash status"""
+        return asyncio.run_coroutine_threadsafe(
+            self._client.trash_meeting_recording(meeting), self._loop)
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._client.close()
@@ -1,3 +1,6 @@
+import threading
+import time
+import typing as tp
 from datetime import datetime, timezone
 
 import jwt
@@ -8,12 +11,11 @@ from lectorium_zoom_pull.config import Config
 OAUTH_ENDPOINT = 'https://zoom.us/oauth/token'
 
 
-def jwt_access_token(config: Config) -> str:
+def jwt_access_token(config: Config, ttl_seconds: int = 10) -> str:
     ALGORITHM = 'HS256'
-    TTL_SECONDS = 10
 
     now = datetime.now(tz=timezone.utc)
-    expiration = int(now.timestamp()) + TTL_SECONDS
+    expiration = int(now.timestamp()) + ttl_seconds
     payload = {
         'iss': config.api_key.get_secret_value(),
         'exp': expiration
@@ -32,3 +34,57 @@ def jwt_access_token(config: Config) -> str:
         encoded = encoded.decode()
 
     return encoded
+
+
+class TokenProvider:
+    """Caches an access token, issues a new one shortly before expiration
+
+    Safe to share between threads. Subclasses implement `_issue',
+    e.g. an OAuth flow against `OAUTH_ENDPOINT'
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _issue(self) -> tp.Tuple[str, float]:
+        """Return value: token and its expiration as `time.monotonic()'"""
+        raise NotImplementedError
+
+    def token(self) -> str:
+        with self._lock:
+            margin = self.config.token_refresh_margin
+            if time.monotonic() + margin >= self._expires_at:
+                self._token, self._expires_at = self._issue()
+            return self._token
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+
+class JwtTokenProvider(TokenProvider):
+    def _issue(self) -> tp.Tuple[str, float]:
+        ttl = self.config.token_ttl
+        issued_at = time.monotonic()
+        return jwt_access_token(self.config, ttl), issued_at + ttl
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def token_provider(config: Config) -> TokenProvider:
+    """Process-wide token provider"""
+    global _provider
+    with _provider_lock:
+        if _provider is None or _provider.config is not config:
+            _provider = JwtTokenProvider(config)
+        return _provider
+
+
+def access_token(config: Config) -> str:
+    return token_provider(config).token()
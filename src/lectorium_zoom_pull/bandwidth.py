@@ -0,0 +1,129 @@
+import datetime
+import re
+import threading
+import typing as tp
+
+from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.progress import parse_size
+from lectorium_zoom_pull.ratelimit import TokenBucket
+
+
+_PERIOD_RE = re.compile(r'(\d\d?):(\d\d)-(\d\d?):(\d\d)=(.+)')
+
+
+def parse_rate(text: str) -> tp.Optional[float]:
+    """Bytes per second from e.g. `500K', `20M', `1.5GiB'
+
+    Return value: None for unlimited, `0' or `unlimited'
+    """
+    text = text.strip()
+    if text.lower() == 'unlimited':
+        return None
+    try:
+        rate = parse_size(text)
+    except ValueError:
+        raise ValueError(f'Invalid bandwidth: {text!r}') from None
+    return rate or None
+
+
+class RateSchedule:
+    """Bandwidth depending on time of day
+
+    Spec is a comma-separated list of `HH:MM-HH:MM=RATE' periods and
+    at most one plain `RATE' for the rest of the day, e.g.
+    `09:00-19:00=10M,22:00-06:00=unlimited,50M'. Periods may wrap
+    around midnight, the first matching one wins
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        self.periods = []
+        self.default = None
+        has_default = False
+        for entry in filter(None, map(str.strip, spec.split(','))):
+            match = _PERIOD_RE.fullmatch(entry)
+            if match is None:
+                if has_default:
+                    raise ValueError(f'Several default rates in {spec!r}')
+                self.default = parse_rate(entry)
+                has_default = True
+                continue
+            hour1, min1, hour2, min2, rate = match.groups()
+            self.periods.append((
+                datetime.time(int(hour1), int(min1)),
+                datetime.time(int(hour2), int(min2)),
+                parse_rate(rate),
+            ))
+
+    def __bool__(self) -> bool:
+        return bool(self.periods) or self.default is not None
+
+    def rate_at(self, moment: datetime.time) -> tp.Optional[float]:
+        """Return value: bytes per second, None if unlimited"""
+        for first, last, rate in self.periods:
+            if first <= last:
+                inside = first <= moment < last
+            else:
+                inside = moment >= first or moment < last
+            if inside:
+                return rate
+        return self.default
+
+
+class BandwidthLimiter:
+    """Paces received bytes of one or many transfers to a `RateSchedule'"""
+
+    def __init__(self, schedule: RateSchedule):
+        self.schedule = schedule
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    def consume(self, size: int) -> float:
+        """Blocks until `size' bytes fit, return value: seconds waited"""
+        rate = self.schedule.rate_at(datetime.datetime.now().time())
+        if rate is None:
+            return 0.0
+        with self._lock:
+            if self._bucket is None or self._bucket.rate != rate:
+                # Profile switched, start over with a second of burst
+                self._bucket = TokenBucket(rate)
+            bucket = self._bucket
+        return bucket.acquire(size)
+
+
+_global_limiter = None
+_lock = threading.Lock()
+
+
+def global_limiter(config: Config) -> BandwidthLimiter:
+    """Process-wide limiter shared by all transfers"""
+    global _global_limiter
+    with _lock:
+        if _global_limiter is None \
+                or _global_limiter.schedule.spec != config.bandwidth_limit:
+            _global_limiter = BandwidthLimiter(
+                RateSchedule(config.bandwidth_limit))
+        return _global_limiter
+
+
+def transfer_throttle(
+    config: Config,
+) -> tp.Optional[tp.Callable[[int], None]]:
+    """Throttle for a new transfer, see `stream_to_file'
+
+    Return value: None if bandwidth is not limited
+    """
+    limiters = []
+    if config.bandwidth_limit:
+        limiters.append(global_limiter(config))
+    if config.transfer_bandwidth_limit:
+        limiters.append(BandwidthLimiter(
+            RateSchedule(config.transfer_bandwidth_limit)))
+    if not limiters:
+        return None
+
+    def throttle(size: int) -> None:
+        for limiter in limiters:
+            limiter.consume(size)
+
+    return throttle
@@ -0,0 +1,276 @@
+import datetime
+import json
+import logging
+import sqlite3
+import typing as tp
+
+from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.meetings import iter_meetings
+from lectorium_zoom_pull.models import Meeting
+from lectorium_zoom_pull.months import parse_date
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meetings (
+    uuid TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS meetings_by_date
+    ON meetings (account_id, start_date);
+CREATE INDEX IF NOT EXISTS meetings_by_id
+    ON meetings (id);
+
+CREATE TABLE IF NOT EXISTS recording_files (
+    id TEXT PRIMARY KEY,
+    meeting_uuid TEXT NOT NULL REFERENCES meetings (uuid) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recording_files_by_meeting
+    ON recording_files (meeting_uuid);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    account_id TEXT PRIMARY KEY,
+    synced_from TEXT NOT NULL,
+    synced_to TEXT NOT NULL,
+    synced_at TEXT NOT NULL
+);
+'''
+
+
+def _start_date(meeting: Meeting) -> str:
+    start_time = meeting.start_time
+    if start_time.tzinfo is not None:
+        start_time = start_time.astimezone(datetime.timezone.utc)
+    return start_time.date().isoformat()
+
+
+def resolve_date_range(
+    from_date: tp.Optional[str],
+    to_date: tp.Optional[str],
+) -> tp.Tuple[datetime.date, datetime.date]:
+    """Apply API defaults: since yesterday, up to today"""
+    today = datetime.date.today()
+    return (
+        parse_date(from_date) if from_date
+        else today - datetime.timedelta(days=1),
+        parse_date(to_date) if to_date else today,
+    )
+
+
+class MetadataCache:
+    """Local copy of recordings listing, one contiguous date range per account
+
+    Days older than `config.cache_refresh_days' before the end of synced
+    range are considered final and are not requested again
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def synced_range(
+        self,
+        account_id: str,
+    ) -> tp.Optional[tp.Tuple[datetime.date, datetime.date]]:
+        row = self.db.execute(
+            'SELECT synced_from, synced_to FROM sync_state '
+            'WHERE account_id = ?',
+            (account_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return parse_date(row[0]), parse_date(row[1])
+
+    def store(self, meeting: Meeting) -> None:
+        with self.db:
+            self._insert(meeting)
+
+    def _insert(self, meeting: Meeting) -> None:
+        body = json.loads(meeting.json(exclude={'recording_files'}))
+        self.db.execute(
+            'INSERT OR REPLACE INTO meetings VALUES (?, ?, ?, ?, ?, ?)',
+            (
+                meeting.uuid,
+                meeting.id,
+                meeting.account_id,
+                _start_date(meeting),
+                meeting.start_time.isoformat(),
+                json.dumps(body),
+            )
+        )
+        self.db.execute(
+            'DELETE FROM recording_files WHERE meeting_uuid = ?',
+            (meeting.uuid,)
+        )
+        self.db.executemany(
+            'INSERT OR REPLACE INTO recording_files VALUES (?, ?, ?, ?)',
+            [
+                (
+                    rfile.id or f'{meeting.uuid}/{position}',
+                    meeting.uuid,
+                    position,
+                    rfile.json(),
+                )
+                for position, rfile in enumerate(meeting.recording_files)
+            ]
+        )
+
+    def forget(self, meeting: Meeting) -> None:
+        with self.db:
+            self.db.execute(
+                'DELETE FROM meetings WHERE uuid = ?', (meeting.uuid,))
+
+    def replace_range(
+        self,
+        account_id: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        meetings: tp.Iterable[Meeting],
+    ) -> int:
+        """Return value: number of stored meetings"""
+        count = 0
+        with self.db:
+            self.db.execute(
+                'DELETE FROM meetings WHERE account_id = ? '
+                'AND start_date BETWEEN ? AND ?',
+                (account_id, from_date.isoformat(), to_date.isoformat())
+            )
+            for meeting in meetings:
+                self._insert(meeting)
+                count += 1
+        return count
+
+    def set_synced_range(
+        self,
+        account_id: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+    ) -> None:
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)',
+                (
+                    account_id,
+                    from_date.isoformat(),
+                    to_date.isoformat(),
+                    datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                )
+            )
+
+    def meetings(
+        self,
+        account_id: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+    ) -> tp.Iterator[Meeting]:
+        rows = self.db.execute(
+            'SELECT uuid, body FROM meetings WHERE account_id = ? '
+            'AND start_date BETWEEN ? AND ? ORDER BY start_time',
+            (account_id, from_date.isoformat(), to_date.isoformat())
+        ).fetchall()
+        for uuid, body in rows:
+            files = self.db.execute(
+                'SELECT body FROM recording_files WHERE meeting_uuid = ? '
+                'ORDER BY position',
+                (uuid,)
+            )
+            meeting = json.loads(body)
+            meeting['recording_files'] = [json.loads(f) for f, in files]
+            yield Meeting(**meeting)
+
+
+def _missing_ranges(
+    requested: tp.Tuple[datetime.date, datetime.date],
+    synced: tp.Optional[tp.Tuple[datetime.date, datetime.date]],
+    refresh_days: int,
+) -> tp.Tuple[
+    tp.List[tp.Tuple[datetime.date, datetime.date]],
+    tp.Tuple[datetime.date, datetime.date],
+]:
+    """Return value: ranges to fetch and synced range afterwards"""
+    from_date, to_date = requested
+    one_day = datetime.timedelta(days=1)
+
+    if synced is None:
+        return [requested], requested
+
+    synced_from, synced_to = synced
+    if from_date > synced_to + one_day or to_date < synced_from - one_day:
+        # Disjoint ranges, start over
+        return [requested], requested
+
+    ranges = []
+    if from_date < synced_from:
+        ranges.append((from_date, synced_from - one_day))
+    refresh_from = max(from_date, synced_to - one_day * refresh_days)
+    if refresh_from <= to_date:
+        ranges.append((refresh_from, to_date))
+
+    return ranges, (min(from_date, synced_from), max(to_date, synced_to))
+
+
+def sync(
+    config: Config,
+    cache: MetadataCache,
+    from_date: tp.Optional[str],
+    to_date: tp.Optional[str],
+) -> None:
+    requested = resolve_date_range(from_date, to_date)
+    synced = cache.synced_range(config.account_id)
+    ranges, synced = _missing_ranges(
+        requested, synced, config.cache_refresh_days)
+
+    for range_from, range_to in ranges:
+        fetched = iter_meetings(
+            config,
+            from_date=range_from.isoformat(),
+            to_date=range_to.isoformat(),
+        )
+        count = cache.replace_range(
+            config.account_id, range_from, range_to, fetched)
+        logging.info(
+            'Cache: synced %d meetings from %s to %s',
+            count, range_from, range_to
+        )
+
+    cache.set_synced_range(config.account_id, *synced)
+
+
+def open_cache(config: Config) -> tp.Optional[MetadataCache]:
+    if config.cache_path is None:
+        if config.offline:
+            raise ValueError('Offline mode requires a metadata cache')
+        return None
+    return MetadataCache(config.cache_path)
+
+
+def cached_meetings(
+    config: Config,
+    cache: MetadataCache,
+    from_date: tp.Optional[str],
+    to_date: tp.Optional[str],
+) -> tp.Iterator[Meeting]:
+    requested = resolve_date_range(from_date, to_date)
+
+    if config.offline:
+        synced = cache.synced_range(config.account_id)
+        if synced is None:
+            logging.warning('Cache: nothing synced yet')
+        elif not (synced[0] <= requested[0] and requested[1] <= synced[1]):
+            logging.warning(
+                'Cache: only synced from %s to %s', *synced)
+    else:
+        sync(config, cache, from_date, to_date)
+
+    return cache.meetings(config.account_id, *requested)
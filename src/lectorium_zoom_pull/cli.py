@@ -1,78 +1,107 @@
+import functools
 import logging
+import signal
+import sys
+import threading
 import typing as tp
 
 import click
 
-from lectorium_zoom_pull import commands
-from lectorium_zoom_pull.config import Config
-
-
-pass_config = click.make_pass_decorator(Config)
-
-
-def make_meeting_filter(
-    meeting_ids: str = None,
-    topic_contains: tp.Sequence[str] = None,
-    not_topic_contains: tp.Sequence[str] = None,
-    topic_regex: str = None,
-    host_email_contains: tp.Sequence[str] = None,
-    host_email_regex: tp.Sequence[str] = None,
-) -> callable:
-    filters = list()
-
-    if meeting_ids:
-        meeting_ids = set(meeting_ids.split(','))
-        filters.append(commands.Filter.meeting_id_in(meeting_ids))
-    if topic_contains:
-        substrings = list(topic_contains)
-        filters.append(commands.Filter.topic_contains(substrings))
-    if not_topic_contains:
-        substrings = list(not_topic_contains)
-        positive_filter = commands.Filter.topic_contains(substrings)
-        filters.append(lambda meeting: not positive_filter(meeting))
-    if topic_regex:
-        expression = topic_regex
-        filters.append(commands.Filter.topic_regex(expression))
-    if host_email_contains:
-        substrings = list(host_email_contains)
-        filters.append(commands.Filter.host_email_contains(substrings))
-    if host_email_regex:
-        expression = host_email_regex
-        filters.append(commands.Filter.host_email_regex(expression))
-
-    if filters:
-        return commands.Filter.conjunction(filters)
-    else:
-        raise ValueError(
-            'Refusing to start without filters, specify at least one')
+from lectorium_zoom_pull.diskspace import DEFAULT_SPACE_RESERVE, SPACE_POLICIES
+from lectorium_zoom_pull.filters import make_meeting_filter
+
+# Commands import `requests', `pydantic' and the rest only when they run,
+# so that `--help' and usage errors stay fast
+if tp.TYPE_CHECKING:
+    from lectorium_zoom_pull.config import Config
+
+
+class Settings:
+    """Global options, turned into `Config' once a command needs it"""
+
+    def __init__(self, **overrides):
+        self.overrides = overrides
+        self.built = None
+
+    def config(self) -> 'Config':
+        if self.built is None:
+            from lectorium_zoom_pull.config import Config
+            self.built = Config(**self.overrides)
+            if self.built.debug:
+                logging.getLogger().setLevel(logging.DEBUG)
+        return self.built
+
+
+def pass_config(f: tp.Callable) -> tp.Callable:
+    """Pass `Config' built from global options as the first argument"""
+    @click.pass_obj
+    def new_func(settings: Settings, *args, **kwargs):
+        return f(settings.config(), *args, **kwargs)
+    return functools.update_wrapper(new_func, f)
 
 
 @click.group()
 @click.option('--debug/--no-debug', default=None)
 @click.option('--download-progress/--no-download-progress', default=None)
 @click.option('--secrets-dir', envvar='LZP_SECRETS_DIR')
+@click.option('--cache', 'cache_path')
+@click.option('--offline/--online', default=None)
+@click.option('--metrics-json', 'metrics_json')
+@click.option('--metrics-prom', 'metrics_prom')
+@click.option('--bandwidth-limit')
+@click.option('--transfer-bandwidth-limit')
 @click.pass_context
-def cli(ctx, debug, download_progress, secrets_dir):
-    config = dict()
+def cli(
+    ctx,
+    debug,
+    download_progress,
+    secrets_dir,
+    cache_path,
+    offline,
+    metrics_json,
+    metrics_prom,
+    bandwidth_limit,
+    transfer_bandwidth_limit,
+):
+    overrides = dict()
 
     if debug is not None:
-        config.update(debug=debug)
+        overrides.update(debug=debug)
     if download_progress is not None:
-        config.update(download_progress=download_progress)
+        overrides.update(download_progress=download_progress)
     if secrets_dir is not None:
-        config.update(_secrets_dir=secrets_dir)
-
-    config = Config(**config)
+        overrides.update(_secrets_dir=secrets_dir)
+    if cache_path is not None:
+        overrides.update(cache_path=cache_path)
+    if offline is not None:
+        overrides.update(offline=offline)
+    if metrics_json is not None:
+        overrides.update(metrics_json=metrics_json)
+    if metrics_prom is not None:
+        overrides.update(metrics_prom=metrics_prom)
+    if bandwidth_limit is not None:
+        overrides.update(bandwidth_limit=bandwidth_limit)
+    if transfer_bandwidth_limit is not None:
+        overrides.update(transfer_bandwidth_limit=transfer_bandwidth_limit)
 
-    loglevel = logging.DEBUG if config.debug else logging.INFO
+    loglevel = logging.DEBUG if debug else logging.INFO
     logging.basicConfig(level=loglevel)
 
-    ctx.obj = config
+    settings = Settings(**overrides)
+    ctx.obj = settings
+
+    def write_metrics():
+        if settings.built is not None:
+            from lectorium_zoom_pull import commands
+            commands.write_metrics(settings.built)
+
+    ctx.call_on_close(write_metrics)
 
 
 @cli.command('list')
 @click.option('--from-date')
 @click.option('--to-date')
+@click.option('--meeting-ids')
 @click.option('--topic-contains', multiple=True)
 @click.option('--not-topic-contains', multiple=True)
 @click.option('--topic-regex')
@@ -80,16 +109,20 @@ def cli(ctx, debug, download_progress, secrets_dir):
 @click.option('--host-email-regex')
 @pass_config
 def list_records(
-    config: Config,
+    config: 'Config',
     from_date,
     to_date,
+    meeting_ids,
     topic_contains,
     not_topic_contains,
     topic_regex,
     host_email_contains,
     host_email_regex,
 ):
+    from lectorium_zoom_pull import commands
+
     meeting_filter = make_meeting_filter(
+        meeting_ids=meeting_ids,
         topic_contains=topic_contains,
         not_topic_contains=not_topic_contains,
         topic_regex=topic_regex,
@@ -116,11 +149,26 @@ def list_records(
 @click.option('--host-email-regex')
 @click.option('--downloads-dir', required=True)
 @click.option('--trash-after-download/--no-trash-after-download', default=False) # noqa
-@click.option('--csv-log', required=True)
-@click.option('--csv-paths-relative-to', required=True)
+@click.option('--csv-log')
+@click.option('--csv-paths-relative-to')
+@click.option('--jobs', type=click.IntRange(min=1), default=1)
+@click.option('--segments', type=click.IntRange(min=1), default=1)
+@click.option('--state-db')
+@click.option('--trash-jobs', type=click.IntRange(min=1), default=4)
+@click.option('--order', default='listing')
+@click.option('--lookahead', type=click.IntRange(min=0), default=0)
+@click.option('--space-policy', type=click.Choice(SPACE_POLICIES), default='refuse') # noqa
+@click.option('--space-reserve', default=DEFAULT_SPACE_RESERVE)
+@click.option('--file-types')
+@click.option('--recording-types')
+@click.option('--min-size')
+@click.option('--max-size')
+@click.option('--rules', 'rules_path')
+@click.option('--plan', 'plan_path')
+@click.option('--from-plan')
 @pass_config
 def download_records(
-    config: Config,
+    config: 'Config',
     from_date,
     to_date,
     meeting_ids,
@@ -133,7 +181,143 @@ def download_records(
     trash_after_download,
     csv_log,
     csv_paths_relative_to,
+    jobs,
+    segments,
+    state_db,
+    trash_jobs,
+    order,
+    lookahead,
+    space_policy,
+    space_reserve,
+    file_types,
+    recording_types,
+    min_size,
+    max_size,
+    rules_path,
+    plan_path,
+    from_plan,
 ):
+    if plan_path is None and (csv_log is None or
+                              csv_paths_relative_to is None):
+        raise click.UsageError(
+            '--csv-log and --csv-paths-relative-to are required '
+            'unless --plan is given')
+
+    from lectorium_zoom_pull import commands
+    from lectorium_zoom_pull.selection import selection_rules
+
+    if plan_path and from_plan:
+        raise ValueError('Use either --plan or --from-plan')
+    meeting_filter = None
+    if from_plan is None:
+        meeting_filter = make_meeting_filter(
+            meeting_ids=meeting_ids,
+            topic_contains=topic_contains,
+            not_topic_contains=not_topic_contains,
+            topic_regex=topic_regex,
+            host_email_contains=host_email_contains,
+            host_email_regex=host_email_regex,
+        )
+    rules = selection_rules(
+        file_types, recording_types, min_size, max_size, rules_path)
+
+    if plan_path:
+        commands.plan_records(
+            config,
+            from_date,
+            to_date,
+            meeting_filter,
+            downloads_dir,
+            plan_path,
+            state_db,
+            rules,
+        )
+        return
+
+    failures = commands.download_records(
+        config,
+        from_date,
+        to_date,
+        meeting_filter,
+        downloads_dir,
+        trash_after_download,
+        csv_log,
+        csv_paths_relative_to,
+        jobs,
+        segments,
+        state_db,
+        trash_jobs,
+        order,
+        lookahead,
+        space_policy,
+        space_reserve,
+        from_plan,
+        rules,
+    )
+    if failures:
+        sys.exit(1)
+
+
+@cli.command('watch')
+@click.option('--since')
+@click.option('--interval', type=click.FloatRange(min=1), default=60)
+@click.option('--meeting-ids')
+@click.option('--topic-contains', multiple=True)
+@click.option('--not-topic-contains', multiple=True)
+@click.option('--topic-regex')
+@click.option('--host-email-contains', multiple=True)
+@click.option('--host-email-regex')
+@click.option('--downloads-dir', required=True)
+@click.option('--trash-after-download/--no-trash-after-download', default=False) # noqa
+@click.option('--csv-log', required=True)
+@click.option('--csv-paths-relative-to', required=True)
+@click.option('--jobs', type=click.IntRange(min=1), default=1)
+@click.option('--segments', type=click.IntRange(min=1), default=1)
+@click.option('--state-db')
+@click.option('--trash-jobs', type=click.IntRange(min=1), default=4)
+@click.option('--order', default='listing')
+@click.option('--lookahead', type=click.IntRange(min=0), default=0)
+@click.option('--space-policy', type=click.Choice(SPACE_POLICIES), default='refuse') # noqa
+@click.option('--space-reserve', default=DEFAULT_SPACE_RESERVE)
+@click.option('--file-types')
+@click.option('--recording-types')
+@click.option('--min-size')
+@click.option('--max-size')
+@click.option('--rules', 'rules_path')
+@click.option('--max-attempts', type=click.IntRange(min=1), default=5)
+@pass_config
+def watch_records(
+    config: 'Config',
+    since,
+    interval,
+    meeting_ids,
+    topic_contains,
+    not_topic_contains,
+    topic_regex,
+    host_email_contains,
+    host_email_regex,
+    downloads_dir,
+    trash_after_download,
+    csv_log,
+    csv_paths_relative_to,
+    jobs,
+    segments,
+    state_db,
+    trash_jobs,
+    order,
+    lookahead,
+    space_policy,
+    space_reserve,
+    file_types,
+    recording_types,
+    min_size,
+    max_size,
+    rules_path,
+    max_attempts,
+):
+    from lectorium_zoom_pull import commands
+    from lectorium_zoom_pull.selection import selection_rules
+
     meeting_filter = make_meeting_filter(
         meeting_ids=meeting_ids,
         topic_contains=topic_contains,
@@ -142,17 +326,46 @@ def download_records(
         host_email_contains=host_email_contains,
         host_email_regex=host_email_regex,
     )
+    rules = selection_rules(
+        file_types, recording_types, min_size, max_size, rules_path)
+
+    stop = threading.Event()
+
+    def shutdown(signum, frame):
+        logging.info(
+            'Got signal %d, finishing downloads in progress. '
+            'Repeat to exit immediately', signum)
+        stop.set()
+        signal.signal(signum, previous[signum])
 
-    commands.download_records(
+    previous = {
+        signum: signal.signal(signum, shutdown)
+        for signum in [signal.SIGTERM, signal.SIGINT]
+    }
+
+    failures = commands.watch_records(
         config,
-        from_date,
-        to_date,
         meeting_filter,
         downloads_dir,
         trash_after_download,
         csv_log,
         csv_paths_relative_to,
+        since,
+        interval,
+        jobs,
+        segments,
+        state_db,
+        trash_jobs,
+        order,
+        lookahead,
+        stop,
+        space_policy,
+        space_reserve,
+        rules,
+        max_attempts,
     )
+    if failures:
+        sys.exit(1)
 
 
 @cli.command('restore-trashed')
@@ -162,16 +375,20 @@ def download_records(
 @click.option('--topic-regex')
 @click.option('--host-email-contains', multiple=True)
 @click.option('--host-email-regex')
+@click.option('--jobs', type=click.IntRange(min=1), default=1)
 @pass_config
 def restore_trashed(
-    config: Config,
+    config: 'Config',
     meeting_ids,
     topic_contains,
     not_topic_contains,
     topic_regex,
     host_email_contains,
     host_email_regex,
+    jobs,
 ):
+    from lectorium_zoom_pull import commands
+
     meeting_filter = make_meeting_filter(
         meeting_ids=meeting_ids,
         topic_contains=topic_contains,
@@ -181,7 +398,22 @@ def restore_trashed(
         host_email_regex=host_email_regex,
     )
 
-    commands.restore_trashed_records(
+    failures = commands.restore_trashed_records(
         config,
         meeting_filter,
+        jobs,
     )
+    if failures:
+        sys.exit(1)
+
+
+@cli.command('verify')
+@click.option('--downloads-dir', required=True)
+@click.option('--state-db')
+@click.option('--jobs', type=click.IntRange(min=1))
+def verify(downloads_dir, state_db, jobs):
+    from lectorium_zoom_pull import commands
+
+    failures = commands.verify_downloads(downloads_dir, state_db, jobs)
+    if failures:
+        sys.exit(1)
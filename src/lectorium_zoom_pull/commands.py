@@ -1,53 +1,100 @@
+import collections
+import datetime
+import itertools
 import logging
-import re
+import os.path
+import threading
+import time
 import typing as tp
+from concurrent.futures import ProcessPoolExecutor
 
+from lectorium_zoom_pull import metrics, progress
+from lectorium_zoom_pull.aio import AsyncZoomClient, TrashStage, run_sync
+from lectorium_zoom_pull.bandwidth import transfer_throttle
+from lectorium_zoom_pull.cache import (
+    MetadataCache,
+    cached_meetings,
+    open_cache,
+    resolve_date_range,
+)
 from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.diskspace import (
+    DEFAULT_SPACE_RESERVE,
+    SPACE_POLICIES,
+    fit_batch,
+    free_space,
+)
 from lectorium_zoom_pull.downloads import PathManager
-from lectorium_zoom_pull.models import Meeting
+from lectorium_zoom_pull.filters import Filter, Predicate  # noqa: F401
+from lectorium_zoom_pull.models import Meeting, MeetingSummary, as_meeting
+from lectorium_zoom_pull.ordering import (
+    OrderKey,
+    PriorityExecutor,
+    order_key,
+)
+from lectorium_zoom_pull.plan import Plan
+from lectorium_zoom_pull.selection import SelectionRules
+from lectorium_zoom_pull.session import api_session
+from lectorium_zoom_pull.state import DownloadState
+from lectorium_zoom_pull.transfer import sha256_file
 from lectorium_zoom_pull.meetings import (
-    fetch_all_meetings,
-    download_meeting_recording,
-    trash_meeting_recording,
-    restore_meeting_recording,
+    MeetingDownload,
+    downloadable_files,
+    iter_meetings,
+    iter_meetings_by_id,
+    pending_files,
+    submit_meeting_recording,
 )
 
 
-class Filter:
-    @classmethod
-    def _apply(cls, filters: tp.List[callable], meeting: Meeting):
-        return map(lambda f: f(meeting), filters)
+# Listed meetings checked against free space at once, a listing page
+SPACE_CHECK_BATCH = 100
+
 
-    @classmethod
-    def conjunction(cls, filters: tp.List[callable]) -> callable:
-        return lambda meeting: all(cls._apply(filters, meeting))
+def _listing(
+    config: Config,
+    cache: tp.Optional[MetadataCache],
+    from_date: str,
+    to_date: str,
+    meeting_filter: tp.Optional[tp.Callable[[Meeting], bool]] = None,
+    keep_raw: bool = True,
+) -> tp.Iterable[tp.Union[Meeting, MeetingSummary]]:
+    """Meetings that `meeting_filter' has to be applied to
 
-    @classmethod
-    def meeting_id_in(cls, meeting_ids: tp.Set[str]) -> callable:
-        return lambda meeting: meeting.id in meeting_ids
+    Filters limited to a few meeting ids are pushed down to API.
+    Listings from API are not validated, see `as_meeting'. Without
+    `keep_raw', they carry summary fields only and cannot be validated
+    """
+    meeting_ids = None
+    if isinstance(meeting_filter, Predicate):
+        meeting_ids = meeting_filter.required_meeting_ids()
 
-    @classmethod
-    def topic_contains(cls, substrings: tp.List[str]) -> callable:
-        substrings = list(map(str.lower, substrings))
-        return lambda meeting: any(
-            meeting.topic.lower().count(s) for s in substrings
+    if meeting_ids is not None and not config.offline:
+        logging.info('Fetching %d meetings by id', len(meeting_ids))
+        return iter_meetings_by_id(config, meeting_ids, from_date, to_date)
+    elif cache is None:
+        return iter_meetings(
+            config,
+            from_date=from_date,
+            to_date=to_date,
+            summary=True,
+            keep_raw=keep_raw,
         )
+    else:
+        return cached_meetings(config, cache, from_date, to_date)
 
-    @classmethod
-    def topic_regex(cls, expression: str) -> callable:
-        matcher = re.compile(expression)
-        return lambda meeting: bool(matcher.search(meeting.topic))
 
-    @classmethod
-    def host_email_contains(cls, substrings: tp.List[str]) -> callable:
-        return lambda meeting: any(
-            meeting.host_email.count(s) for s in substrings
-        )
+def _log_api_usage(config: Config) -> None:
+    logging.info('API usage: %s', api_session(config).scheduler.summary())
+
 
-    @classmethod
-    def host_email_regex(cls, expression: str) -> callable:
-        matcher = re.compile(expression)
-        return lambda meeting: bool(matcher.search(meeting.host_email))
+def write_metrics(config: Config) -> None:
+    """Export metrics of this run to paths set in `config'"""
+    scheduler = api_session(config).scheduler
+    if config.metrics_json:
+        metrics.run.write_json(config.metrics_json, scheduler)
+    if config.metrics_prom:
+        metrics.run.write_prometheus(config.metrics_prom, scheduler)
 
 
 def list_records(
@@ -56,11 +103,9 @@ def list_records(
     to_date: str,
     meeting_filter: tp.Optional[tp.Callable[[Meeting], bool]]
 ) -> None:
-    all_meetings = fetch_all_meetings(
-        config,
-        from_date=from_date,
-        to_date=to_date
-    )
+    cache = open_cache(config)
+    all_meetings = _listing(
+        config, cache, from_date, to_date, meeting_filter, keep_raw=False)
 
     if meeting_filter:
         meetings = filter(meeting_filter, all_meetings)
@@ -73,6 +118,114 @@ def list_records(
         print(line)
 
 
+def _sized(
+    meetings: tp.Iterable[tp.Union[Meeting, MeetingSummary]],
+    path_manager: PathManager,
+    state: DownloadState,
+    rules: tp.Optional[SelectionRules] = None,
+) -> tp.List[tp.Tuple[tp.Union[Meeting, MeetingSummary], int]]:
+    """Meetings with total sizes of their pending files
+
+    Part files left by previous runs are not subtracted
+    """
+    batch = []
+    for meet in meetings:
+        try:
+            meet = as_meeting(meet)
+        except Exception:
+            # Reported when submitted
+            batch.append((meet, 0))
+            continue
+        files = pending_files(path_manager, state, meet, rules)
+        batch.append((meet, sum(rfile.file_size or 0 for rfile in files)))
+    return batch
+
+
+def _fit_space(
+    batch: tp.List[tp.Tuple[tp.Union[Meeting, MeetingSummary], int]],
+    available: int,
+    space_policy: str,
+) -> tp.Tuple[tp.List[tp.Union[Meeting, MeetingSummary]], int]:
+    """Return value: meetings to download and bytes they need"""
+    kept, skipped = fit_batch(
+        [(item, item[1]) for item in batch], available, space_policy)
+    for meet, _ in skipped:
+        logging.warning('Not enough disk space, skipped %s %s',
+                        meet.start_time, meet.topic)
+    metrics.run.count('meetings_skipped_space', len(skipped))
+    return [meet for meet, _ in kept], sum(size for _, size in kept)
+
+
+def _check_space(
+    meetings: tp.Iterable[tp.Union[Meeting, MeetingSummary]],
+    path_manager: PathManager,
+    state: DownloadState,
+    space_policy: str,
+    space_reserve: float,
+    rules: tp.Optional[SelectionRules] = None,
+) -> tp.Tuple[tp.List[tp.Union[Meeting, MeetingSummary]], tp.List[Meeting]]:
+    """Preflight of a batch against free space of the downloads directory
+
+    `space_reserve' bytes are kept free, see `_sized' for sizes
+
+    Return value: meetings to download and skipped ones, see `fit_batch'
+    """
+    batch = _sized(meetings, path_manager, state, rules)
+    available = free_space(path_manager.prefix) - int(space_reserve)
+    kept, _ = _fit_space(batch, available, space_policy)
+    kept_ids = set(map(id, kept))
+    return kept, [meet for meet, _ in batch if id(meet) not in kept_ids]
+
+
+def _stream_space_checked(
+    meetings: tp.Iterable[tp.Union[Meeting, MeetingSummary]],
+    path_manager: PathManager,
+    state: DownloadState,
+    space_policy: str,
+    space_reserve: float,
+    refused: tp.List[RuntimeError],
+    rules: tp.Optional[SelectionRules] = None,
+) -> tp.Iterator[tp.Union[Meeting, MeetingSummary]]:
+    """Listing checked against free space `SPACE_CHECK_BATCH' at a time
+
+    Free space is measured once, bytes needed by every admitted meeting
+    are subtracted from it. So `trim' skips the same meetings as with the
+    whole listing checked at once, without waiting for the listing.
+    `refuse' raises `RuntimeError' right away if the first batch does not
+    fit. A later batch that does not fit ends the listing instead, its
+    error is appended to `refused'
+    """
+    available = free_space(path_manager.prefix) - int(space_reserve)
+    meetings = iter(meetings)
+
+    def next_batch() -> tp.Optional[list]:
+        """Return value: None once the listing is exhausted"""
+        nonlocal available
+        chunk = list(itertools.islice(meetings, SPACE_CHECK_BATCH))
+        if not chunk:
+            return None
+        batch = _sized(chunk, path_manager, state, rules)
+        kept, needed = _fit_space(batch, available, space_policy)
+        available -= needed
+        return kept
+
+    def rest() -> tp.Iterator[tp.Union[Meeting, MeetingSummary]]:
+        while True:
+            try:
+                kept = next_batch()
+            except RuntimeError as e:
+                refused.append(e)
+                return
+            if kept is None:
+                return
+            yield from kept
+
+    first = next_batch()
+    if first is None:
+        return iter(())
+    return itertools.chain(first, rest())
+
+
 def download_records(
     config: Config,
     from_date: str,
@@ -82,56 +235,506 @@ def download_records(
     trash_after_download: bool,
     csv_log_path: str,
     csv_paths_relative_to: str,
-) -> None:
+    jobs: int = 1,
+    segments: int = 1,
+    state_path: tp.Optional[str] = None,
+    trash_jobs: int = 4,
+    order: str = 'listing',
+    lookahead: int = 0,
+    space_policy: str = 'refuse',
+    space_reserve: str = DEFAULT_SPACE_RESERVE,
+    from_plan: tp.Optional[str] = None,
+    rules: tp.Optional[SelectionRules] = None,
+) -> int:
+    """Return value: number of meetings with errors
+
+    Files of up to `max(jobs, lookahead)' listed meetings are queued
+    together and downloaded in `order', see `ORDER_POLICIES'. Unless
+    `space_policy' is `ignore', listed meetings are checked against free
+    disk space as they arrive, see `_stream_space_checked'. A refusal
+    after the first batch is raised once meetings in flight are done
+
+    Only files selected by `rules' are downloaded. With `from_plan',
+    files of a plan written by `plan_records' are downloaded instead,
+    dates, `meeting_filter' and `rules' are not used
+    """
+    priority = order_key(order)
+    # Invalid bandwidth specs fail here rather than on every file
+    transfer_throttle(config)
+    reserve = _space_options(space_policy, space_reserve)
+    progress.board.enabled = config.download_progress
     path_manager = PathManager(downloads_dir)
-    all_meetings = fetch_all_meetings(
+    state = DownloadState(downloads_dir, state_path)
+    unfinished = state.unfinished()
+    if unfinished:
+        logging.info('Files left unfinished by previous runs: %d',
+                     len(unfinished))
+    if from_plan is not None:
+        cache = None
+        plan = Plan.read(from_plan)
+        if plan.downloads_dir != os.path.abspath(downloads_dir):
+            logging.warning('Plan was made for downloads dir %s',
+                            plan.downloads_dir)
+        meetings = plan.meetings
+        rules = plan.selection()
+    else:
+        cache = open_cache(config)
+        all_meetings = _listing(
+            config, cache, from_date, to_date, meeting_filter)
+        meetings = filter(meeting_filter, all_meetings)
+    refused = []
+    if space_policy != 'ignore':
+        meetings = _stream_space_checked(
+            meetings, path_manager, state, space_policy, reserve, refused,
+            rules)
+
+    failures = _download_meetings(
         config,
-        from_date=from_date,
-        to_date=to_date
+        meetings,
+        path_manager,
+        state,
+        cache,
+        trash_after_download,
+        csv_log_path,
+        csv_paths_relative_to,
+        jobs,
+        segments,
+        trash_jobs,
+        priority,
+        max(jobs, lookahead),
+        rules=rules,
     )
 
-    meetings = filter(meeting_filter, all_meetings)
+    _log_api_usage(config)
+    if refused:
+        raise refused[0]
+    return failures
 
-    with open(csv_log_path, 'a') as csv_log:
-        for idx, meet in enumerate(meetings):
-            status = ''
+
+def plan_records(
+    config: Config,
+    from_date: str,
+    to_date: str,
+    meeting_filter: tp.Callable[[Meeting], bool],
+    downloads_dir: str,
+    plan_path: str,
+    state_path: tp.Optional[str] = None,
+    rules: tp.Optional[SelectionRules] = None,
+) -> None:
+    """Print what `download_records' would fetch, write it to `plan_path'
+
+    ETA is based on throughput of earlier runs recorded in the journal.
+    Only files selected by `rules' are planned
+    """
+    path_manager = PathManager(downloads_dir)
+    state = DownloadState(downloads_dir, state_path)
+    cache = open_cache(config)
+    all_meetings = _listing(
+        config, cache, from_date, to_date, meeting_filter)
+
+    def validated() -> tp.Iterator[Meeting]:
+        for meet in filter(meeting_filter, all_meetings):
             try:
-                status += download_meeting_recording(
-                    config,
-                    path_manager,
-                    csv_log,
-                    csv_paths_relative_to,
-                    meet
-                )
-                if trash_after_download:
-                    status += ' / ' + trash_meeting_recording(config, meet)
+                yield as_meeting(meet)
             except Exception as e:
-                logging.exception('Unhandled exception')
-                status += f'Unhandled exception: {e}'
+                logging.error('Not planned, invalid meeting %s: %s',
+                              meet.uuid, e)
+
+    first, last = resolve_date_range(from_date, to_date)
+    plan = Plan.build(
+        validated(),
+        path_manager,
+        state,
+        rules,
+        from_date=first.isoformat(),
+        to_date=last.isoformat(),
+    )
+    print(plan.format(state.throughput()))
+    plan.write(plan_path)
+    logging.info('Plan written to %s', plan_path)
+    _log_api_usage(config)
+
+
+def _space_options(space_policy: str, space_reserve: str) -> float:
+    """Validate preflight options, return value: reserve in bytes"""
+    if space_policy not in SPACE_POLICIES:
+        raise ValueError('Unknown space policy {!r}, expected {}'.format(
+            space_policy, ', '.join(SPACE_POLICIES)))
+    return progress.parse_size(space_reserve)
+
+
+def _download_meetings(
+    config: Config,
+    meetings: tp.Iterable[tp.Union[Meeting, MeetingSummary]],
+    path_manager: PathManager,
+    state: DownloadState,
+    cache: tp.Optional[MetadataCache],
+    trash_after_download: bool,
+    csv_log_path: str,
+    csv_paths_relative_to: str,
+    jobs: int,
+    segments: int,
+    trash_jobs: int,
+    priority: OrderKey,
+    window: int,
+    on_report: tp.Optional[tp.Callable[[Meeting, bool], None]] = None,
+    rules: tp.Optional[SelectionRules] = None,
+) -> int:
+    """Download, trash and report `meetings' in order
+
+    `on_report' is called for every reported meeting with its outcome.
+    Only files selected by `rules' are downloaded and verified
+
+    Return value: number of meetings with errors
+    """
+    failures = 0
+    started = time.time()
+    files_before, bytes_before = metrics.run.transferred()
+
+    def submit(meet: tp.Union[Meeting, MeetingSummary]) -> MeetingDownload:
+        try:
+            return submit_meeting_recording(
+                config, path_manager, state, as_meeting(meet), executor,
+                segments, priority, rules)
+        except Exception as e:
+            return MeetingDownload(meet, error=e)
+
+    def collect(idx: int, download: MeetingDownload) -> None:
+        """Hand a downloaded meeting to the trash stage, if verified"""
+        meet = download.meeting
+        status = ''
+        ok = True
+        trashed = None
+        try:
+            status += download.result(csv_log, csv_paths_relative_to)
+            if trash_after_download:
+                files = downloadable_files(meet, rules)
+                problems = state.verify_on_disk(meet, files)
+                if not files:
+                    status += ' / Not trashed: no files saved locally'
+                elif problems:
+                    ok = False
+                    status += ' / Not trashed: ' + '; '.join(problems)
+                else:
+                    trashed = trash_stage.submit(meet)
+        except Exception as e:
+            logging.exception('Unhandled exception')
+            ok = False
+            status += f'Unhandled exception: {e}'
+
+        reports.append((idx, meet, status, ok, trashed))
+
+    def report(block: bool) -> None:
+        """Print finished meetings in listing order"""
+        nonlocal failures
+        while reports:
+            idx, meet, status, ok, trashed = reports[0]
+            if trashed is not None:
+                if not (block or trashed.done()):
+                    return
+                try:
+                    status += ' / ' + trashed.result()
+                    metrics.run.count('meetings_trashed')
+                    state.mark_trashed(meet)
+                    if cache is not None:
+                        cache.forget(meet)
+                except Exception as e:
+                    logging.error('Unhandled exception', exc_info=e)
+                    ok = False
+                    status += f' / Unhandled exception: {e}'
+            reports.popleft()
+            metrics.run.count('meetings')
+            if not ok:
+                failures += 1
+            if on_report is not None:
+                on_report(meet, ok)
 
             fmt = '{:3} | MeetingID {} | {} | {} | {}'
             print(fmt.format(
                 idx + 1, meet.id, meet.start_time, meet.topic, status))
 
+    trash_stage = TrashStage(config, trash_jobs) \
+        if trash_after_download else None
+    reports = collections.deque()
+
+    # Up to `window' meetings are in flight, their files share the pool.
+    # Trashing runs behind in background, results are reported strictly
+    # in listing order
+    try:
+        with open(csv_log_path, 'a') as csv_log, \
+                PriorityExecutor(max_workers=jobs) as executor:
+            in_flight = collections.deque()
+            for idx, meet in enumerate(meetings):
+                in_flight.append((idx, submit(meet)))
+                if len(in_flight) > window:
+                    collect(*in_flight.popleft())
+                    report(block=False)
+            while in_flight:
+                collect(*in_flight.popleft())
+                report(block=False)
+        report(block=True)
+    finally:
+        if trash_stage is not None:
+            trash_stage.close()
+
+    files, size = metrics.run.transferred()
+    if size > bytes_before:
+        state.record_run(started, time.time() - started,
+                         size - bytes_before, files - files_before)
+
+    metrics.run.count('meetings_failed', failures)
+    return failures
+
+
+def is_completed(meeting: Meeting) -> bool:
+    """Whether Zoom has finished processing every recording file"""
+    return all(
+        rfile.status == 'completed' for rfile in meeting.recording_files)
+
+
+def watch_records(
+    config: Config,
+    meeting_filter: tp.Callable[[Meeting], bool],
+    downloads_dir: str,
+    trash_after_download: bool,
+    csv_log_path: str,
+    csv_paths_relative_to: str,
+    since: tp.Optional[str] = None,
+    interval: float = 60,
+    jobs: int = 1,
+    segments: int = 1,
+    state_path: tp.Optional[str] = None,
+    trash_jobs: int = 4,
+    order: str = 'listing',
+    lookahead: int = 0,
+    stop: tp.Optional[threading.Event] = None,
+    space_policy: str = 'refuse',
+    space_reserve: str = DEFAULT_SPACE_RESERVE,
+    rules: tp.Optional[SelectionRules] = None,
+    max_attempts: int = 5,
+) -> int:
+    """Download newly completed recordings every `interval' seconds
+
+    Polls list days starting from the high-water mark: the start date of
+    the newest handled meeting, or of the oldest one that is still being
+    processed by Zoom or has failed. Failed meetings, and ones skipped
+    for lack of disk space, are retried on every poll. Meetings that
+    failed `max_attempts' times, or are no longer listed, are given up.
+    Metrics are written after every poll.
+    Runs until `stop' is set, files being downloaded by then are finished
+
+    Return value: number of meetings still failing at exit
+    """
+    stop = stop or threading.Event()
+    priority = order_key(order)
+    transfer_throttle(config)
+    reserve = _space_options(space_policy, space_reserve)
+    progress.board.enabled = config.download_progress
+    path_manager = PathManager(downloads_dir)
+    state = DownloadState(downloads_dir, state_path)
+
+    high_water = resolve_date_range(since, None)[0]
+    # Start dates of meetings to look at again, and of handled ones
+    pending: tp.Dict[str, datetime.date] = {}
+    handled: tp.Dict[str, datetime.date] = {}
+    failed = set()
+    attempts = collections.Counter()
+
+    def on_report(meet: Meeting, ok: bool) -> None:
+        nonlocal high_water
+        start_date = meet.start_time.date()
+        if ok:
+            handled[meet.uuid] = start_date
+            pending.pop(meet.uuid, None)
+            failed.discard(meet.uuid)
+            del attempts[meet.uuid]
+            high_water = max(high_water, start_date)
+            return
+
+        failed.add(meet.uuid)
+        attempts[meet.uuid] += 1
+        if attempts[meet.uuid] < max_attempts:
+            pending[meet.uuid] = start_date
+            return
+        logging.warning('Giving up on %s %s after %d attempts',
+                        meet.uuid, meet.topic, attempts[meet.uuid])
+        # Not listed again, still reported as failing at exit
+        handled[meet.uuid] = start_date
+        pending.pop(meet.uuid, None)
+        del attempts[meet.uuid]
+
+    while not stop.is_set():
+        started = time.monotonic()
+        window_from = min([high_water, *pending.values()])
+        for uuid, start_date in list(handled.items()):
+            if start_date < window_from:
+                del handled[uuid]
+
+        ready = []
+        try:
+            listed = iter_meetings(
+                config, from_date=window_from.isoformat(), summary=True)
+            seen = set()
+            for meet in filter(meeting_filter, listed):
+                seen.add(meet.uuid)
+                if meet.uuid in handled:
+                    continue
+                meet = as_meeting(meet)
+                if is_completed(meet):
+                    ready.append(meet)
+                else:
+                    logging.debug('Not completed yet: %s', meet.uuid)
+                    pending[meet.uuid] = meet.start_time.date()
+            # Trashed or deleted elsewhere
+            for uuid in set(pending) - seen:
+                logging.warning('%s is no longer listed, giving up', uuid)
+                del pending[uuid]
+                failed.discard(uuid)
+                del attempts[uuid]
+        except Exception:
+            logging.exception('Polling since %s failed', window_from)
+
+        if ready and space_policy != 'ignore':
+            try:
+                ready, skipped = _check_space(
+                    ready, path_manager, state, space_policy, reserve,
+                    rules)
+            except RuntimeError as e:
+                logging.error('%s', e)
+                ready, skipped = [], ready
+            for meet in skipped:
+                pending[meet.uuid] = meet.start_time.date()
+
+        if ready:
+            logging.info('New completed recordings: %d', len(ready))
+            _download_meetings(
+                config,
+                (meet for meet in ready if not stop.is_set()),
+                path_manager,
+                state,
+                None,
+                trash_after_download,
+                csv_log_path,
+                csv_paths_relative_to,
+                jobs,
+                segments,
+                trash_jobs,
+                priority,
+                max(jobs, lookahead),
+                on_report,
+                rules,
+            )
+            _log_api_usage(config)
+
+        try:
+            write_metrics(config)
+        except OSError:
+            logging.exception('Failed to write metrics')
+        stop.wait(max(interval - (time.monotonic() - started), 0))
+
+    state.close()
+    return len(failed)
+
 
 def restore_trashed_records(
     config: Config,
     meeting_filter: tp.Callable[[Meeting], bool],
-) -> None:
-    all_meetings = fetch_all_meetings(
+    jobs: int = 1,
+) -> int:
+    """Return value: number of meetings with errors"""
+    if config.offline:
+        raise ValueError('Trash listing is not cached, cannot run offline')
+    cache = open_cache(config)
+    all_meetings = iter_meetings(
         config,
         trash=True
     )
     meetings = filter(meeting_filter, all_meetings)
 
-    for idx, meet in enumerate(meetings):
-        status = ''
+    async def restore_all() -> int:
+        failures = 0
+        client = AsyncZoomClient(config, jobs)
         try:
-            status += restore_meeting_recording(config, meet)
-        except Exception as e:
-            logging.exception('Unhandled exception')
-            status += f'Unhandled exception: {e}'
+            results = client.map_ordered(
+                client.restore_meeting_recording, meetings)
+            idx = 0
+            async for meet, status, error in results:
+                if error is not None:
+                    logging.error(
+                        'Unhandled exception', exc_info=error)
+                    status = f'Unhandled exception: {error}'
+                    failures += 1
+                else:
+                    metrics.run.count('meetings_restored')
+                    if cache is not None:
+                        cache.store(meet)
+
+                fmt = '{:3} | MeetingID {} | {} | {} | {}'
+                print(fmt.format(
+                    idx + 1, meet.id, meet.start_time, meet.topic, status))
+                metrics.run.count('meetings')
+                idx += 1
+        finally:
+            client.close()
+        return failures
+
+    failures = run_sync(restore_all())
+    metrics.run.count('meetings_failed', failures)
+    _log_api_usage(config)
+    return failures
+
+
+def _file_sha256(path: str) -> str:
+    return sha256_file(path).hexdigest()
+
+
+def verify_downloads(
+    downloads_dir: str,
+    state_path: tp.Optional[str] = None,
+    jobs: tp.Optional[int] = None,
+) -> int:
+    """Check sizes and digests of journaled files against the disk
+
+    Files are hashed by `jobs' processes, all cores by default. Files
+    without a digest get one recorded
+
+    Return value: number of missing or damaged files
+    """
+    state = DownloadState(downloads_dir, state_path)
+    failures = 0
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        checks = []
+        for record in state.downloaded():
+            abs_path = os.path.join(downloads_dir, record.path)
+            try:
+                size = os.path.getsize(abs_path)
+            except OSError:
+                checks.append((record, 'Missing'))
+                continue
+            if record.size is not None and size != record.size:
+                checks.append(
+                    (record, f'Has {size} bytes, expected {record.size}'))
+                continue
+            checks.append((record, executor.submit(_file_sha256, abs_path)))
+
+        for idx, (record, check) in enumerate(checks):
+            if isinstance(check, str):
+                status = check
+                failures += 1
+            elif record.sha256 is None:
+                state.set_digest(record.id, check.result())
+                status = 'Checksum recorded'
+            elif check.result() != record.sha256:
+                status = 'Checksum mismatch'
+                failures += 1
+            else:
+                status = 'OK'
+
+            fmt = '{:3} | MeetingID {} | {} | {}'
+            print(fmt.format(idx + 1, record.meeting_id, record.path, status))
 
-        fmt = '{:3} | MeetingID {} | {} | {} | {}'
-        print(fmt.format(
-            idx + 1, meet.id, meet.start_time, meet.topic, status))
+    state.close()
+    metrics.run.count('files_verified', len(checks))
+    metrics.run.count('files_damaged', failures)
+    return failures
@@ -1,3 +1,5 @@
+import typing as tp
+
 from pydantic import BaseSettings, SecretStr
 
 
@@ -5,7 +7,26 @@ class Config(BaseSettings):
     account_id: str
     api_key: SecretStr
     api_secret: SecretStr
+    api_base_url: str = 'https://api.zoom.us/v2'
+    http_pool_size: int = 16
+    listing_jobs: int = 4
+    rate_limit_list: float = 10
+    rate_limit_trash: float = 20
+    rate_limit_download: float = 10
+    max_retries: int = 5
+    retry_backoff: float = 1.0
+    retry_backoff_max: float = 60.0
+    token_ttl: int = 1800
+    token_refresh_margin: int = 60
     download_progress: bool = False
+    segment_threshold: int = 256 * 1024 * 1024
+    bandwidth_limit: str = ''
+    transfer_bandwidth_limit: str = ''
+    cache_path: tp.Optional[str] = None
+    cache_refresh_days: int = 2
+    offline: bool = False
+    metrics_json: tp.Optional[str] = None
+    metrics_prom: tp.Optional[str] = None
     debug: bool = False
 
     class Config:
@@ -0,0 +1,57 @@
+import os.path
+import shutil
+import typing as tp
+
+from lectorium_zoom_pull.progress import format_size
+
+
+SPACE_POLICIES = ('refuse', 'trim', 'ignore')
+# Free space left on the volume unless told otherwise
+DEFAULT_SPACE_RESERVE = '1G'
+
+T = tp.TypeVar('T')
+
+
+def free_space(path: str) -> int:
+    """Bytes available to the user on the filesystem of `path'
+
+    `path' may not exist yet, its nearest existing parent is checked
+    """
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def fit_batch(
+    batch: tp.Sequence[tp.Tuple[T, int]],
+    available: int,
+    policy: str,
+) -> tp.Tuple[tp.List[T], tp.List[T]]:
+    """Split items with their sizes in bytes into kept and skipped ones
+
+    Policies, see `SPACE_POLICIES':
+    `refuse' raises `RuntimeError' if the batch needs more than
+    `available' bytes, `trim' skips items that do not fit anymore,
+    keeping listing order, `ignore' keeps everything
+    """
+    if policy not in SPACE_POLICIES:
+        raise ValueError('Unknown space policy {!r}, expected {}'.format(
+            policy, ', '.join(SPACE_POLICIES)))
+    needed = sum(size for _, size in batch)
+    if policy == 'ignore' or needed <= available:
+        return [item for item, _ in batch], []
+    if policy == 'refuse':
+        raise RuntimeError(
+            'Not enough disk space: batch needs {}, {} available'.format(
+                format_size(needed), format_size(max(available, 0))))
+
+    kept, skipped = [], []
+    available = max(available, 0)
+    for item, size in batch:
+        if size <= available:
+            kept.append(item)
+            available -= size
+        else:
+            skipped.append(item)
+    return kept, skipped
@@ -1,6 +1,7 @@
 import re
 import os
 import os.path
+import typing as tp
 from datetime import datetime
 
 from lectorium_zoom_pull.models import Meeting
@@ -9,6 +10,7 @@ from lectorium_zoom_pull.months import RU_MONTHS
 
 class PathManager:
     REPLACE_IN_NAMES = re.compile(r'[<>:"/\|?*]')
+    INCOMPLETE_MARKER = '.lzp-incomplete'
 
     def __init__(self, prefix: str):
         self.prefix = prefix
@@ -41,10 +43,47 @@ class PathManager:
         )
 
     def is_downloaded(self, meeting: Meeting) -> bool:
-        return os.path.isdir(self._meeting_dir(meeting))
+        """Legacy check for trees downloaded before `DownloadState' existed
+
+        Interrupted downloads of that time left an incomplete marker
+        """
+        path = self._meeting_dir(meeting)
+        return (
+            os.path.isdir(path)
+            and not os.path.exists(
+                os.path.join(path, self.INCOMPLETE_MARKER))
+        )
+
+    def legacy_files(
+        self,
+        meeting: Meeting,
+        sizes: tp.Sequence[tp.Optional[int]],
+    ) -> tp.Optional[tp.List[str]]:
+        """Files of a legacy meeting directory, one per size in `sizes'
+
+        Return value: None unless the directory is downloaded, see
+        `is_downloaded', and every size matches a distinct file in it
+        """
+        if not self.is_downloaded(meeting):
+            return None
+
+        by_size = {}
+        path = self._meeting_dir(meeting)
+        for name in sorted(os.listdir(path)):
+            abs_path = os.path.join(path, name)
+            if name.startswith('.') or not os.path.isfile(abs_path):
+                continue
+            by_size.setdefault(os.path.getsize(abs_path), []).append(abs_path)
+
+        paths = []
+        for size in sizes:
+            candidates = by_size.get(size)
+            if not candidates:
+                return None
+            paths.append(candidates.pop(0))
+        return paths
 
     def mkdir_for(self, meeting: Meeting) -> str:
-        """Throws FileExistsError if `self.is_downloaded(meeting)' is true"""
         path = self._meeting_dir(meeting)
-        os.makedirs(path)
+        os.makedirs(path, exist_ok=True)
         return path
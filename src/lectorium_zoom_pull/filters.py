@@ -0,0 +1,193 @@
+import re
+import typing as tp
+
+
+class _View:
+    """Meeting fields, lowercased at most once per evaluation"""
+    __slots__ = ('meeting', '_lowered')
+
+    def __init__(self, meeting):
+        self.meeting = meeting
+        self._lowered = {}
+
+    def field(self, name: str, lowercase: bool) -> str:
+        if not lowercase:
+            return getattr(self.meeting, name)
+        try:
+            return self._lowered[name]
+        except KeyError:
+            value = getattr(self.meeting, name).lower()
+            self._lowered[name] = value
+            return value
+
+
+class Predicate:
+    """Compiled condition on a meeting
+
+    Conjunctions evaluate cheaper predicates first and stop at the first
+    failed one
+    """
+    cost = 0
+
+    def match(self, view: _View) -> bool:
+        raise NotImplementedError
+
+    def required_meeting_ids(self) -> tp.Optional[tp.FrozenSet[str]]:
+        """Meeting ids outside of which nothing can match, if known"""
+        return None
+
+    def __call__(self, meeting) -> bool:
+        return self.match(_View(meeting))
+
+
+class MeetingIdIn(Predicate):
+    cost = 0
+
+    def __init__(self, meeting_ids: tp.Set[str]):
+        self.meeting_ids = frozenset(meeting_ids)
+
+    def match(self, view: _View) -> bool:
+        return view.meeting.id in self.meeting_ids
+
+    def required_meeting_ids(self) -> tp.Optional[tp.FrozenSet[str]]:
+        return self.meeting_ids
+
+
+class FieldContains(Predicate):
+    """Any of substrings, all of them compiled into a single expression"""
+    cost = 1
+
+    def __init__(
+        self,
+        field: str,
+        substrings: tp.Iterable[str],
+        lowercase: bool,
+    ):
+        substrings = list(substrings)
+        if lowercase:
+            substrings = [s.lower() for s in substrings]
+        # Longer alternatives first, so a prefix never shadows them
+        substrings.sort(key=len, reverse=True)
+
+        self.field = field
+        self.lowercase = lowercase
+        self.matcher = None
+        if substrings:
+            self.matcher = re.compile('|'.join(map(re.escape, substrings)))
+
+    def match(self, view: _View) -> bool:
+        if self.matcher is None:
+            return False
+        value = view.field(self.field, self.lowercase)
+        return self.matcher.search(value) is not None
+
+
+class FieldRegex(Predicate):
+    cost = 2
+
+    def __init__(self, field: str, expression: str):
+        self.field = field
+        self.matcher = re.compile(expression)
+
+    def match(self, view: _View) -> bool:
+        value = view.field(self.field, False)
+        return self.matcher.search(value) is not None
+
+
+class Negation(Predicate):
+    def __init__(self, predicate: Predicate):
+        self.predicate = predicate
+        self.cost = predicate.cost
+
+    def match(self, view: _View) -> bool:
+        return not self.predicate.match(view)
+
+
+class Conjunction(Predicate):
+    def __init__(self, predicates: tp.Iterable[Predicate]):
+        self.predicates = sorted(predicates, key=lambda p: p.cost)
+        self.cost = sum(p.cost for p in self.predicates)
+
+    def match(self, view: _View) -> bool:
+        for predicate in self.predicates:
+            if not predicate.match(view):
+                return False
+        return True
+
+    def required_meeting_ids(self) -> tp.Optional[tp.FrozenSet[str]]:
+        required = None
+        for predicate in self.predicates:
+            meeting_ids = predicate.required_meeting_ids()
+            if meeting_ids is not None:
+                if required is None:
+                    required = meeting_ids
+                else:
+                    required = required & meeting_ids
+        return required
+
+
+class Filter:
+    @classmethod
+    def conjunction(cls, filters: tp.List[Predicate]) -> Predicate:
+        return Conjunction(filters)
+
+    @classmethod
+    def negation(cls, predicate: Predicate) -> Predicate:
+        return Negation(predicate)
+
+    @classmethod
+    def meeting_id_in(cls, meeting_ids: tp.Set[str]) -> Predicate:
+        return MeetingIdIn(meeting_ids)
+
+    @classmethod
+    def topic_contains(cls, substrings: tp.List[str]) -> Predicate:
+        return FieldContains('topic', substrings, lowercase=True)
+
+    @classmethod
+    def topic_regex(cls, expression: str) -> Predicate:
+        return FieldRegex('topic', expression)
+
+    @classmethod
+    def host_email_contains(cls, substrings: tp.List[str]) -> Predicate:
+        return FieldContains('host_email', substrings, lowercase=False)
+
+    @classmethod
+    def host_email_regex(cls, expression: str) -> Predicate:
+        return FieldRegex('host_email', expression)
+
+
+def make_meeting_filter(
+    meeting_ids: str = None,
+    topic_contains: tp.Sequence[str] = None,
+    not_topic_contains: tp.Sequence[str] = None,
+    topic_regex: str = None,
+    host_email_contains: tp.Sequence[str] = None,
+    host_email_regex: tp.Sequence[str] = None,
+) -> callable:
+    filters = list()
+
+    if meeting_ids:
+        meeting_ids = set(meeting_ids.split(','))
+        filters.append(Filter.meeting_id_in(meeting_ids))
+    if topic_contains:
+        substrings = list(topic_contains)
+        filters.append(Filter.topic_contains(substrings))
+    if not_topic_contains:
+        substrings = list(not_topic_contains)
+        positive_filter = Filter.topic_contains(substrings)
+        filters.append(Filter.negation(positive_filter))
+    if topic_regex:
+        expression = topic_regex
+        filters.append(Filter.topic_regex(expression))
+    if host_email_contains:
+        substrings = list(host_email_contains)
+        filters.append(Filter.host_email_contains(substrings))
+    if host_email_regex:
+        expression = host_email_regex
+        filters.append(Filter.host_email_regex(expression))
+
+    if filters:
+        return Filter.conjunction(filters)
+    else:
+        raise ValueError(
+            'Refusing to start without filters, specify at least one')
@@ -1,23 +1,43 @@
+import datetime
+import itertools
 import json
 import logging
 import os
 import os.path
-import subprocess
+import time
 import urllib.parse
 import typing as tp
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 
-import requests
-
-from lectorium_zoom_pull.auth import jwt_access_token
+from lectorium_zoom_pull import metrics
+from lectorium_zoom_pull.auth import access_token
+from lectorium_zoom_pull.bandwidth import transfer_throttle
 from lectorium_zoom_pull.config import Config
 from lectorium_zoom_pull.downloads import PathManager
 from lectorium_zoom_pull.models import (
     AccountsRecordingsRequest,
     AccountsRecordingsResponse,
     Meeting,
+    MeetingSummary,
+    PastMeetingInstancesResponse,
     RecordingFile,
-    FileType,
 )
+from lectorium_zoom_pull.months import month_windows, parse_date
+from lectorium_zoom_pull.ordering import OrderKey
+from lectorium_zoom_pull.selection import (
+    DEFAULT_SELECTION,
+    FileSelection,
+    SelectionRules,
+)
+from lectorium_zoom_pull.session import api_session, cdn_session
+from lectorium_zoom_pull.state import (
+    DONE_STATES,
+    DownloadState,
+    FileRecord,
+    FileState,
+    file_key,
+)
+from lectorium_zoom_pull.transfer import stream_to_file
 
 
 def encode_meeting_identifier(id_or_uuid: str) -> str:
@@ -35,19 +55,14 @@ def encode_meeting_identifier(id_or_uuid: str) -> str:
 # List
 #
 
-def list_recordings(
+def list_recordings_raw(
     config: Config,
     request: AccountsRecordingsRequest,
-) -> AccountsRecordingsResponse:
-    BASEURL = 'https://api.zoom.us/v2'
-
-    token = jwt_access_token(config)
-    rsp = requests.get(
-        BASEURL + '/accounts/me/recordings',
-        headers={
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json',
-        },
+) -> dict:
+    """Decoded response, not validated"""
+    rsp = api_session(config).get(
+        '/accounts/me/recordings',
+        category='list',
         params=request.dict(by_alias=True, exclude_defaults=True),
     )
 
@@ -55,18 +70,29 @@ def list_recordings(
         raise ValueError('Bad response {}: {}'.format(
             rsp.status_code, rsp.text
         ))
-    return AccountsRecordingsResponse(**json.loads(rsp.text))
+    return json.loads(rsp.content)
 
 
-def fetch_all_meetings(
+def list_recordings(
     config: Config,
-    from_date: tp.Optional[str] = None,
-    to_date: tp.Optional[str] = None,
-    trash: bool = False,
-) -> tp.List[Meeting]:
-    meetings = []
-    next_page_token = None
-    while True:
+    request: AccountsRecordingsRequest,
+) -> AccountsRecordingsResponse:
+    return AccountsRecordingsResponse(**list_recordings_raw(config, request))
+
+
+def _iter_window(
+    config: Config,
+    from_date: tp.Optional[datetime.date],
+    to_date: tp.Optional[datetime.date],
+    trash: bool,
+    summary: bool,
+    keep_raw: bool = True,
+) -> tp.Iterator[tp.Union[Meeting, MeetingSummary]]:
+    """Yields meetings as soon as their page arrives
+
+    The next page is requested in background while the current one is consumed
+    """
+    def request_page(next_page_token: tp.Optional[str]):
         request = {
             'page_size': 100,
             'next_page_token': next_page_token,
@@ -76,17 +102,168 @@ def fetch_all_meetings(
             'trash_type': 'meeting_recordings' if trash else None,
         }
         request = AccountsRecordingsRequest(**request)
+        raw = list_recordings_raw(config, request)
+        if summary:
+            return raw, [
+                MeetingSummary(m, keep_raw) for m in raw['meetings']
+            ]
+        else:
+            return raw, AccountsRecordingsResponse(**raw).meetings
+
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        page = prefetcher.submit(request_page, None)
+        first_page = True
+        while page is not None:
+            raw, meetings = page.result()
+            logging.debug('Page size: %d', raw['page_size'])
+            if first_page:
+                logging.info(
+                    'Total records from %s to %s: %d',
+                    from_date, to_date, raw['total_records']
+                )
+                first_page = False
+
+            page = None
+            if raw.get('next_page_token'):
+                page = prefetcher.submit(request_page, raw['next_page_token'])
+
+            yield from meetings
+
+
+def iter_meetings(
+    config: Config,
+    from_date: tp.Optional[str] = None,
+    to_date: tp.Optional[str] = None,
+    trash: bool = False,
+    summary: bool = False,
+    keep_raw: bool = True,
+) -> tp.Iterator[tp.Union[Meeting, MeetingSummary]]:
+    """Yields meetings from any date range, deduplicated by uuid
+
+    API allows at most a month per request, so ranges are split into
+    month windows listed concurrently by up to `config.listing_jobs' threads.
+    With `summary', entries are not validated, see `MeetingSummary'.
+    Without `keep_raw', summaries cannot be turned into meetings later,
+    listings only read for the summary fields should not keep them
+    """
+    if from_date is None:
+        # API default range, yesterday to today
+        yield from _iter_window(
+            config, None, to_date, trash, summary, keep_raw)
+        return
+
+    windows = month_windows(
+        parse_date(from_date),
+        parse_date(to_date) if to_date else datetime.date.today(),
+    )
+    if not windows:
+        # Reversed range or a start in the future
+        return
+    if len(windows) == 1:
+        yield from _iter_window(
+            config, *windows[0], trash, summary, keep_raw)
+        return
+
+    def list_window(window):
+        return list(_iter_window(config, *window, trash, summary, keep_raw))
+
+    seen = set()
+    with ThreadPoolExecutor(max_workers=config.listing_jobs) as executor:
+        futures = [executor.submit(list_window, w) for w in windows[1:]]
+        # The first window streams page by page while others are listed
+        listed = itertools.chain(
+            [_iter_window(config, *windows[0], trash, summary, keep_raw)],
+            (future.result() for future in futures),
+        )
+        for window_meetings in listed:
+            for meeting in window_meetings:
+                if meeting.uuid not in seen:
+                    seen.add(meeting.uuid)
+                    yield meeting
 
-        batch = list_recordings(config, request)
-        logging.debug('Page size: %d', batch.page_size)
-        logging.info('Total records: %d', batch.total_records)
-        meetings.extend(batch.meetings)
 
-        next_page_token = batch.next_page_token
-        if not next_page_token:
-            break
+def get_meeting_recordings(
+    config: Config,
+    id_or_uuid: str,
+) -> tp.Optional[Meeting]:
+    """Recordings of a meeting instance, the latest one for a meeting id
+
+    Return value: None if there are no recordings
+    """
+    url = '/meetings/{}/recordings'.format(
+        encode_meeting_identifier(id_or_uuid)
+    )
+    rsp = api_session(config).get(url, category='list')
+
+    if rsp.status_code == 404:
+        logging.info('No recordings for %s: %s', id_or_uuid, rsp.text)
+        return None
+    if rsp.status_code != 200:
+        raise ValueError('Bad response {}: {}'.format(
+            rsp.status_code, rsp.text
+        ))
+    return Meeting(**json.loads(rsp.text))
+
+
+def list_past_instances(
+    config: Config,
+    meeting_id: str,
+) -> PastMeetingInstancesResponse:
+    url = '/past_meetings/{}/instances'.format(
+        encode_meeting_identifier(meeting_id)
+    )
+    rsp = api_session(config).get(url, category='list')
+
+    if rsp.status_code != 200:
+        raise ValueError('Bad response {}: {}'.format(
+            rsp.status_code, rsp.text
+        ))
+    return PastMeetingInstancesResponse(**json.loads(rsp.text))
 
-    return meetings
+
+def iter_meetings_by_id(
+    config: Config,
+    meeting_ids: tp.Iterable[str],
+    from_date: tp.Optional[str] = None,
+    to_date: tp.Optional[str] = None,
+) -> tp.Iterator[Meeting]:
+    """Yields recordings of given meetings without listing the account
+
+    Without a date range, only the latest instance of every meeting is
+    fetched. With a date range, instances of recurring meetings are looked
+    up and those started within the range are fetched
+    """
+    meeting_ids = sorted(meeting_ids)
+    with ThreadPoolExecutor(max_workers=config.listing_jobs) as executor:
+        if from_date is None and to_date is None:
+            targets = meeting_ids
+        else:
+            first = parse_date(from_date) if from_date else datetime.date.min
+            last = parse_date(to_date) if to_date else datetime.date.today()
+
+            def instances(meeting_id: str) -> tp.List[str]:
+                return list_past_instances(config, meeting_id).meetings
+
+            targets = []
+            all_instances = executor.map(instances, meeting_ids)
+            for meeting_id, found in zip(meeting_ids, all_instances):
+                found = [
+                    instance for instance in found
+                    if first <= instance.start_time.date() <= last
+                ]
+                logging.info(
+                    'Meeting %s: %d instances from %s to %s',
+                    meeting_id, len(found), first, last
+                )
+                found.sort(key=lambda instance: instance.start_time)
+                targets.extend(instance.uuid for instance in found)
+
+        def fetch(id_or_uuid: str) -> tp.Optional[Meeting]:
+            return get_meeting_recordings(config, id_or_uuid)
+
+        for meeting in executor.map(fetch, targets):
+            if meeting is not None:
+                yield meeting
 
 
 #
@@ -95,19 +272,12 @@ def fetch_all_meetings(
 
 
 def trash_meeting_recording(config: Config, meeting: Meeting) -> str:
-    BASEURL = 'https://api.zoom.us/v2'
-
-    token = jwt_access_token(config)
-    url = '{}/meetings/{}/recordings'.format(
-        BASEURL,
+    url = '/meetings/{}/recordings'.format(
         encode_meeting_identifier(meeting.uuid)
     )
-    rsp = requests.delete(
+    rsp = api_session(config).delete(
         url,
-        headers={
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json',
-        },
+        category='trash',
         params={
             'action': 'trash',
         }
@@ -132,19 +302,12 @@ def trash_meeting_recording(config: Config, meeting: Meeting) -> str:
 
 
 def restore_meeting_recording(config: Config, meeting: Meeting) -> str:
-    BASEURL = 'https://api.zoom.us/v2'
-
-    token = jwt_access_token(config)
-    url = '{}/meetings/{}/recordings/status'.format(
-        BASEURL,
+    url = '/meetings/{}/recordings/status'.format(
         encode_meeting_identifier(meeting.uuid)
     )
-    rsp = requests.put(
+    rsp = api_session(config).put(
         url,
-        headers={
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json',
-        },
+        category='trash',
         json={
             'action': 'recover',
         },
@@ -168,28 +331,51 @@ def restore_meeting_recording(config: Config, meeting: Meeting) -> str:
 #
 
 
-def is_downloadable(rfile: RecordingFile) -> bool:
-    FILE_TYPES = {FileType.MP4, FileType.M4A, FileType.CHAT}
+def is_downloadable(
+    rfile: RecordingFile,
+    selection: tp.Optional[FileSelection] = None,
+) -> bool:
+    """Whether `rfile' is ready and picked by `selection'
 
+    Default selection is MP4, M4A and CHAT files of any size
+    """
     return (
-        rfile.file_type in FILE_TYPES
+        (selection or DEFAULT_SELECTION)(rfile)
         and rfile.status == 'completed'
         and rfile.download_url
     )
 
 
+def downloadable_files(
+    meeting: Meeting,
+    rules: tp.Optional[SelectionRules] = None,
+) -> tp.List[RecordingFile]:
+    """Files of `meeting' to download, according to `rules' for it"""
+    selection = rules.for_meeting(meeting) if rules else None
+    return [
+        rfile for rfile in meeting.recording_files
+        if is_downloadable(rfile, selection)
+    ]
+
+
 def download_recording_file(
     config: Config,
     prefix: str,
     meeting: Meeting,
     rfile: RecordingFile,
-) -> str:
-    """Return value: file basename"""
-    redirect = requests.get(
+    segments: int = 1,
+) -> tp.Tuple[str, str]:
+    """Return value: file basename and SHA-256 hex digest
+
+    Files of at least `config.segment_threshold' bytes are fetched in up to
+    `segments' parallel byte ranges
+    """
+    redirect = api_session(config).get(
         rfile.download_url,
+        category='download',
         allow_redirects=False,
         params={
-            'access_token': jwt_access_token(config)
+            'access_token': access_token(config)
         }
     )
 
@@ -206,50 +392,227 @@ def download_recording_file(
     filename = os.path.basename(redirect_url_path)
     logging.debug('Filename: %s', filename)
 
-    cmdline = [
-        'curl',
-        '-#' if config.download_progress else '-s',
+    if (rfile.file_size or 0) < config.segment_threshold:
+        segments = 1
+
+    label = f'{meeting.id} / {filename}'
+    logging.info('Downloading %s', label)
+    path = os.path.join(prefix, filename)
+    already_complete = os.path.exists(path)
+    started = time.monotonic()
+    downloaded = stream_to_file(
+        cdn_session(config),
         redirect_url,
-        '-o',
-        filename
+        path,
+        label,
+        expected_size=rfile.file_size,
+        segments=segments,
+        retries=config.max_retries,
+        throttle=transfer_throttle(config),
+    )
+    if not already_complete:
+        file_type = rfile.file_type.value if rfile.file_type else 'unknown'
+        metrics.run.observe_file(
+            label, file_type, downloaded.transferred,
+            time.monotonic() - started)
+
+    return filename, downloaded.sha256
+
+
+class MeetingDownload:
+    """Files of one meeting, possibly still being fetched by an executor"""
+
+    def __init__(
+        self,
+        meeting: Meeting,
+        futures: tp.Sequence[tp.Tuple[RecordingFile, Future]] = (),
+        skipped: int = 0,
+        status: tp.Optional[str] = None,
+        error: tp.Optional[Exception] = None,
+    ):
+        self.meeting = meeting
+        self.futures = list(futures)
+        self.skipped = skipped
+        self.status = status
+        self.error = error
+
+    def result(self, csv_log: tp.TextIO, csv_paths_relative_to: str) -> str:
+        """Wait for all files, log fetched ones in listing order.
+
+        Re-raises the first failure after every file has finished
+        """
+        if self.error is not None:
+            raise self.error
+        if self.status is not None:
+            return self.status
+
+        meeting = self.meeting
+        error = None
+        for rfile, future in self.futures:
+            try:
+                abs_path = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+
+            csv_line = (
+                f'{meeting.id}\t' +
+                f'{meeting.uuid}\t' +
+                f'{meeting.start_time:%Y.%m.%d}\t' +
+                f'{meeting.start_time:%H-%M-%S%z}\t' +
+                os.path.relpath(abs_path, start=csv_paths_relative_to)
+            )
+            logging.debug('csv: %s', csv_line)
+            print(csv_line, file=csv_log)
+
+        if error is not None:
+            raise error
+
+        status = f'Fetched {len(self.futures)} files'
+        if self.skipped:
+            status += f', {self.skipped} already downloaded'
+        return status
+
+
+def _download_journaled(
+    config: Config,
+    state: DownloadState,
+    subdir: str,
+    meeting: Meeting,
+    rfile: RecordingFile,
+    segments: int,
+) -> str:
+    """Return value: absolute path of downloaded file"""
+    state.update(meeting, [rfile], FileState.IN_PROGRESS)
+    basename, sha256 = download_recording_file(
+        config, subdir, meeting, rfile, segments)
+    abs_path = os.path.join(subdir, basename)
+    state.update(
+        meeting,
+        [rfile],
+        FileState.COMPLETE,
+        abs_path=abs_path,
+        size=os.path.getsize(abs_path),
+        sha256=sha256,
+    )
+    return abs_path
+
+
+def _is_done(
+    journal: tp.Dict[str, FileRecord],
+    meeting: Meeting,
+    rfile: RecordingFile,
+) -> bool:
+    record = journal.get(file_key(meeting, rfile))
+    if record is None or record.state not in DONE_STATES:
+        return False
+    # Adopted without a path by older versions, fetched again to record it
+    return record.path is not None or record.state == FileState.TRASHED
+
+
+def _adopt_legacy(
+    path_manager: PathManager,
+    state: tp.Optional[DownloadState],
+    meeting: Meeting,
+    files: tp.List[RecordingFile],
+) -> bool:
+    """Journal files of a meeting downloaded before the journal existed
+
+    Files are matched to the directory by their sizes. Without `state',
+    nothing is recorded
+
+    Return value: whether every file was found
+    """
+    paths = path_manager.legacy_files(
+        meeting, [rfile.file_size for rfile in files])
+    if paths is None:
+        return False
+    if state is not None:
+        for rfile, abs_path in zip(files, paths):
+            state.update(
+                meeting,
+                [rfile],
+                FileState.COMPLETE,
+                abs_path=abs_path,
+                size=rfile.file_size,
+            )
+    return True
+
+
+def pending_files(
+    path_manager: PathManager,
+    state: DownloadState,
+    meeting: Meeting,
+    rules: tp.Optional[SelectionRules] = None,
+) -> tp.List[RecordingFile]:
+    """Files `submit_meeting_recording' would queue, without side effects"""
+    journal = state.meeting_files(meeting)
+    files = downloadable_files(meeting, rules)
+    if not journal and _adopt_legacy(path_manager, None, meeting, files):
+        return []
+    return [
+        rfile for rfile in files if not _is_done(journal, meeting, rfile)
+    ]
+
+
+def submit_meeting_recording(
+    config: Config,
+    path_manager: PathManager,
+    state: DownloadState,
+    meeting: Meeting,
+    executor: Executor,
+    segments: int = 1,
+    priority: tp.Optional[OrderKey] = None,
+    rules: tp.Optional[SelectionRules] = None,
+) -> MeetingDownload:
+    """Queue pending files of `meeting' on `executor'
+
+    With `priority', files are queued with `executor.submit_ordered',
+    see `PriorityExecutor'. Only files selected by `rules' are queued
+    """
+    files = downloadable_files(meeting, rules)
+    if len(files) == 0:
+        return MeetingDownload(meeting, status='No downloadable files')
+
+    journal = state.meeting_files(meeting)
+    if not journal and _adopt_legacy(path_manager, state, meeting, files):
+        return MeetingDownload(meeting, status='Already downloaded')
+
+    pending = [
+        rfile for rfile in files if not _is_done(journal, meeting, rfile)
     ]
-    logging.debug('Command line: %s', cmdline)
+    if len(pending) == 0:
+        return MeetingDownload(meeting, status='Already downloaded')
 
-    logging.info('Downloading %s / %s', meeting.id, filename)
-    subprocess.check_call(cmdline, cwd=prefix)
+    # Journal first, so a crash right after mkdir is still resumed
+    new_files = [
+        rfile for rfile in pending if file_key(meeting, rfile) not in journal
+    ]
+    state.update(meeting, new_files, FileState.PENDING)
+    subdir = path_manager.mkdir_for(meeting)
+    logging.debug('Subdir: %s', subdir)
+
+    def submit(rfile: RecordingFile) -> Future:
+        args = (_download_journaled,
+                config, state, subdir, meeting, rfile, segments)
+        if priority is None:
+            return executor.submit(*args)
+        return executor.submit_ordered(priority(meeting, rfile), *args)
 
-    return filename
+    futures = [(rfile, submit(rfile)) for rfile in pending]
+    return MeetingDownload(
+        meeting, futures, skipped=len(files) - len(pending))
 
 
 def download_meeting_recording(
     config: Config,
     path_manager: PathManager,
+    state: DownloadState,
     csv_log: tp.TextIO,
     csv_paths_relative_to: str,
     meeting: Meeting,
 ) -> str:
-    files = list(filter(is_downloadable, meeting.recording_files))
-    if len(files) == 0:
-        return 'No downloadable files'
-
-    subdir = None
-    try:
-        subdir = path_manager.mkdir_for(meeting)
-        logging.debug('Subdir: %s', subdir)
-    except FileExistsError:
-        return 'Already downloaded'
-
-    for rfile in files:
-        basename = download_recording_file(config, subdir, meeting, rfile)
-        abs_path = os.path.join(subdir, basename)
-        csv_line = (
-            f'{meeting.id}\t' +
-            f'{meeting.uuid}\t' +
-            f'{meeting.start_time:%Y.%m.%d}\t' +
-            f'{meeting.start_time:%H-%M-%S%z}\t' +
-            os.path.relpath(abs_path, start=csv_paths_relative_to)
-        )
-        logging.debug('csv: %s', csv_line)
-        print(csv_line, file=csv_log)
-
-    return f'Fetched {len(files)} files'
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        download = submit_meeting_recording(
+            config, path_manager, state, meeting, executor)
+        return download.result(csv_log, csv_paths_relative_to)
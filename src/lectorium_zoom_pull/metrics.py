@@ -0,0 +1,248 @@
+import collections
+import json
+import os
+import threading
+import time
+import typing as tp
+
+
+# Upper bounds in seconds, cumulative like Prometheus histograms
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FILE_BUCKETS = (1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0, 10800.0)
+
+PROM_PREFIX = 'lzp_'
+
+# Transferred files listed in JSON summary, long `watch' runs keep totals
+RECENT_FILES = 100
+
+
+class Histogram:
+    def __init__(self, buckets: tp.Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'buckets': {
+                str(bound): count
+                for bound, count in zip(self.buckets, self.counts)
+            },
+        }
+
+
+class FileMetric(tp.NamedTuple):
+    label: str
+    file_type: str
+    # Bytes received, resumed parts of the file excluded
+    size: int
+    seconds: float
+
+
+class RunMetrics:
+    """Measurements of a single run, shared between threads
+
+    Request counters of `RequestScheduler' are not duplicated here,
+    they are read at export time
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests: tp.Dict[str, Histogram] = {}
+        self.statuses: tp.Dict[tp.Tuple[str, str], int] = {}
+        self.file_durations: tp.Dict[str, Histogram] = {}
+        self.files = 0
+        self.file_bytes = 0
+        self.transfer_seconds = 0.0
+        self.recent_files: tp.Deque[FileMetric] = collections.deque(
+            maxlen=RECENT_FILES)
+        self.counters: tp.Dict[str, int] = {}
+
+    def observe_request(
+        self,
+        category: str,
+        seconds: float,
+        status: str,
+    ) -> None:
+        """`status': HTTP status code or exception class name"""
+        with self._lock:
+            histogram = self.requests.setdefault(
+                category, Histogram(REQUEST_BUCKETS))
+            histogram.observe(seconds)
+            key = (category, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def observe_file(
+        self,
+        label: str,
+        file_type: str,
+        size: int,
+        seconds: float,
+    ) -> None:
+        with self._lock:
+            histogram = self.file_durations.setdefault(
+                file_type, Histogram(FILE_BUCKETS))
+            histogram.observe(seconds)
+            self.files += 1
+            self.file_bytes += size
+            self.transfer_seconds += seconds
+            self.recent_files.append(
+                FileMetric(label, file_type, size, seconds))
+
+    def transferred(self) -> tp.Tuple[int, int]:
+        """Return value: number of downloaded files and bytes received"""
+        with self._lock:
+            return self.files, self.file_bytes
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self, scheduler=None) -> dict:
+        """JSON-compatible run summary
+
+        `scheduler': `RequestScheduler' to take retry counters from
+        """
+        with self._lock:
+            duration = time.time() - self.started
+            result = {
+                'started': self.started,
+                'duration_seconds': round(duration, 3),
+                'counters': dict(self.counters),
+                'requests': {
+                    category: dict(
+                        histogram.to_dict(),
+                        statuses={
+                            status: count
+                            for (cat, status), count in self.statuses.items()
+                            if cat == category
+                        },
+                    )
+                    for category, histogram in self.requests.items()
+                },
+                'files': {
+                    'count': self.files,
+                    'bytes': self.file_bytes,
+                    'transfer_seconds': round(self.transfer_seconds, 3),
+                    'bytes_per_second':
+                        self.file_bytes / duration if duration else 0.0,
+                    'durations': {
+                        file_type: histogram.to_dict()
+                        for file_type, histogram
+                        in self.file_durations.items()
+                    },
+                    'items': [f._asdict() for f in self.recent_files],
+                },
+            }
+        if scheduler is not None:
+            result['scheduler'] = {
+                category: {
+                    'requests': scheduler.requests[category],
+                    'retries': scheduler.retries[category],
+                    'throttled_seconds':
+                        round(scheduler.throttled_seconds[category], 3),
+                }
+                for category in scheduler.requests
+            }
+        return result
+
+    def write_json(self, path: str, scheduler=None) -> None:
+        _write_atomic(path, json.dumps(self.summary(scheduler), indent=2))
+
+    def write_prometheus(self, path: str, scheduler=None) -> None:
+        """Textfile for node exporter, replaced atomically"""
+        _write_atomic(path, format_prometheus(self.summary(scheduler)))
+
+
+def _labels(**labels: str) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, value.replace('"', '\\"'))
+        for name, value in sorted(labels.items())
+    ) + '}'
+
+
+def _histogram_lines(name: str, histogram: dict, **labels: str):
+    for bound, count in histogram['buckets'].items():
+        yield f'{name}_bucket{_labels(le=bound, **labels)} {count}'
+    yield '{}_bucket{} {}'.format(
+        name, _labels(le='+Inf', **labels), histogram['count'])
+    yield f'{name}_sum{_labels(**labels)} {histogram["sum"]}'
+    yield f'{name}_count{_labels(**labels)} {histogram["count"]}'
+
+
+def format_prometheus(summary: dict) -> str:
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str):
+        name = PROM_PREFIX + name
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        return name
+
+    name = metric(
+        'request_duration_seconds', 'histogram', 'Zoom API request latency')
+    for category, histogram in sorted(summary['requests'].items()):
+        lines.extend(_histogram_lines(name, histogram, category=category))
+
+    name = metric('responses_total', 'counter', 'Zoom API responses')
+    for category, histogram in sorted(summary['requests'].items()):
+        for status, count in sorted(histogram['statuses'].items()):
+            lines.append('{}{} {}'.format(
+                name, _labels(category=category, status=status), count))
+
+    scheduler = summary.get('scheduler', {})
+    for key, kind, help_text in [
+        ('retries', 'counter', 'Retried Zoom API requests'),
+        ('throttled_seconds', 'counter', 'Time spent waiting for rate limit'),
+    ]:
+        name = metric(key + '_total', kind, help_text)
+        for category, counters in sorted(scheduler.items()):
+            lines.append('{}{} {}'.format(
+                name, _labels(category=category), counters[key]))
+
+    files = summary['files']
+    name = metric(
+        'file_duration_seconds', 'histogram', 'Recording file transfer time')
+    for file_type, histogram in sorted(files['durations'].items()):
+        lines.extend(_histogram_lines(name, histogram, file_type=file_type))
+    name = metric('file_bytes_total', 'counter', 'Downloaded bytes')
+    lines.append(f'{name} {files["bytes"]}')
+
+    for counter, value in sorted(summary['counters'].items()):
+        name = metric(counter + '_total', 'counter', counter.replace('_', ' '))
+        lines.append(f'{name} {value}')
+
+    name = metric('run_duration_seconds', 'gauge', 'Duration of last run')
+    lines.append(f'{name} {summary["duration_seconds"]}')
+    name = metric(
+        'run_bytes_per_second', 'gauge', 'Average throughput of last run')
+    lines.append(f'{name} {files["bytes_per_second"]:.1f}')
+    name = metric(
+        'run_finished_timestamp_seconds', 'gauge', 'End time of last run')
+    lines.append('{} {:.3f}'.format(
+        name, summary['started'] + summary['duration_seconds']))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path: str, content: str) -> None:
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+run = RunMetrics()
@@ -3,6 +3,7 @@ import typing as tp
 from enum import Enum
 
 from pydantic import BaseModel, Field, HttpUrl, validator
+from pydantic.datetime_parse import parse_datetime
 
 
 class FileType(str, Enum):
@@ -51,7 +52,8 @@ class Meeting(BaseModel):
     account_id: str
 
     host_id: str
-    host_email: str
+    # Missing in responses for a single meeting
+    host_email: str = ''
     topic: str
 
     start_time: datetime.datetime
@@ -63,6 +65,42 @@ class Meeting(BaseModel):
     recording_files: tp.List[RecordingFile]
 
 
+class MeetingSummary:
+    """Unvalidated listing entry with fields needed by filters and `list'
+
+    Keeps the raw entry, if asked to, for validation by `to_meeting'
+    """
+    __slots__ = ('uuid', 'id', 'topic', 'host_email', 'start_time', 'raw')
+
+    def __init__(self, raw: dict, keep_raw: bool = True):
+        self.uuid = raw['uuid']
+        self.id = str(raw['id'])
+        self.topic = raw['topic']
+        self.host_email = raw.get('host_email', '')
+        self.start_time = parse_datetime(raw['start_time'])
+        self.raw = raw if keep_raw else None
+
+    def to_meeting(self) -> Meeting:
+        if self.raw is None:
+            raise ValueError(f'Raw entry of {self.uuid} was not kept')
+        return Meeting(**self.raw)
+
+
+def as_meeting(meeting: tp.Union[Meeting, MeetingSummary]) -> Meeting:
+    if isinstance(meeting, MeetingSummary):
+        return meeting.to_meeting()
+    return meeting
+
+
+class MeetingInstance(BaseModel):
+    uuid: str
+    start_time: datetime.datetime
+
+
+class PastMeetingInstancesResponse(BaseModel):
+    meetings: tp.List[MeetingInstance]
+
+
 class AccountsRecordingsRequest(BaseModel):
     next_page_token: tp.Optional[str]
     page_size: tp.Optional[int]
@@ -1,3 +1,7 @@
+import datetime
+import typing as tp
+
+
 RU_MONTHS = [
     'январь',
     'февраль',
@@ -12,3 +16,25 @@ RU_MONTHS = [
     'ноябрь',
     'декабрь',
 ]
+
+
+def parse_date(value: str) -> datetime.date:
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def month_windows(
+    from_date: datetime.date,
+    to_date: datetime.date,
+) -> tp.List[tp.Tuple[datetime.date, datetime.date]]:
+    """Split inclusive range on calendar month boundaries"""
+    windows = []
+    start = from_date
+    while start <= to_date:
+        if start.month == 12:
+            next_month = datetime.date(start.year + 1, 1, 1)
+        else:
+            next_month = datetime.date(start.year, start.month + 1, 1)
+        end = min(next_month - datetime.timedelta(days=1), to_date)
+        windows.append((start, end))
+        start = next_month
+    return windows
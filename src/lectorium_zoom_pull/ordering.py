@@ -0,0 +1,94 @@
+import heapq
+import itertools
+import threading
+import typing as tp
+from concurrent.futures import Executor, Future
+
+from lectorium_zoom_pull.models import FileType, Meeting, RecordingFile
+
+
+OrderKey = tp.Callable[[Meeting, RecordingFile], tp.Any]
+
+# Audio first, video last, everything else in between
+_TYPE_RANK = {FileType.M4A: 0, FileType.MP4: 2}
+
+ORDER_POLICIES: tp.Dict[str, OrderKey] = {
+    'listing': lambda meeting, rfile: 0,
+    'smallest-first': lambda meeting, rfile: rfile.file_size or 0,
+    'oldest-first': lambda meeting, rfile: meeting.start_time,
+    'm4a-first': lambda meeting, rfile: _TYPE_RANK.get(rfile.file_type, 1),
+}
+
+
+def order_key(policies: str) -> OrderKey:
+    """Combine comma-separated `ORDER_POLICIES', earlier ones dominate"""
+    names = [name.strip() for name in policies.split(',') if name.strip()]
+    unknown = [name for name in names if name not in ORDER_POLICIES]
+    if unknown:
+        raise ValueError('Unknown order policies {}, expected {}'.format(
+            ', '.join(unknown), ', '.join(ORDER_POLICIES)))
+    keys = [ORDER_POLICIES[name] for name in names]
+    return lambda meeting, rfile: tuple(key(meeting, rfile) for key in keys)
+
+
+class PriorityExecutor(Executor):
+    """Thread pool running queued calls with the least priority first
+
+    Calls of equal priority run in submission order
+    """
+
+    def __init__(self, max_workers: int):
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(
+                target=self._work, name=f'download-{idx}', daemon=True)
+            for idx in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.submit_ordered((), fn, *args, **kwargs)
+
+    def submit_ordered(self, priority, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit after shutdown')
+            heapq.heappush(self._queue, (
+                priority, next(self._sequence), future, fn, args, kwargs))
+            self._condition.notify()
+        return future
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._shutdown:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                _, _, future, fn, args, kwargs = heapq.heappop(self._queue)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for item in self._queue:
+                    item[2].cancel()
+                self._queue.clear()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
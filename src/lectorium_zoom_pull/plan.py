@@ -0,0 +1,196 @@
+import datetime
+import json
+import logging
+import os.path
+import typing as tp
+
+from lectorium_zoom_pull.downloads import PathManager
+from lectorium_zoom_pull.meetings import downloadable_files, pending_files
+from lectorium_zoom_pull.models import Meeting, RecordingFile
+from lectorium_zoom_pull.progress import format_size
+from lectorium_zoom_pull.selection import DEFAULT_SELECTION, SelectionRules
+from lectorium_zoom_pull.state import DownloadState, file_key
+
+
+PLAN_VERSION = 1
+
+
+class PlannedFile(tp.NamedTuple):
+    key: str
+    meeting_uuid: str
+    month: str
+    file_type: str
+    size: int
+    present: bool
+
+
+class Totals:
+    def __init__(self):
+        self.files = 0
+        self.size = 0
+        self.present_files = 0
+        self.present_size = 0
+
+    def add(self, planned: PlannedFile) -> None:
+        self.files += 1
+        self.size += planned.size
+        if planned.present:
+            self.present_files += 1
+            self.present_size += planned.size
+
+    @property
+    def missing_size(self) -> int:
+        return self.size - self.present_size
+
+
+class PlannedSelection(SelectionRules):
+    """Selects exactly the files of a plan"""
+
+    def __init__(self, keys: tp.Iterable[str]):
+        super().__init__(DEFAULT_SELECTION)
+        self.keys = frozenset(keys)
+
+    def for_meeting(
+        self,
+        meeting: Meeting,
+    ) -> tp.Callable[[RecordingFile], bool]:
+        def selection(rfile: RecordingFile) -> bool:
+            return file_key(meeting, rfile) in self.keys
+        return selection
+
+
+class Plan:
+    """Downloadable files of listed meetings, without downloading them
+
+    Files are present if the journal or `PathManager' says so, see
+    `pending_files'. Written as JSON, a plan is executed later without
+    listing meetings again
+    """
+
+    def __init__(
+        self,
+        meetings: tp.List[Meeting],
+        files: tp.List[PlannedFile],
+        created: tp.Optional[str] = None,
+        from_date: tp.Optional[str] = None,
+        to_date: tp.Optional[str] = None,
+        downloads_dir: tp.Optional[str] = None,
+    ):
+        self.meetings = meetings
+        self.files = files
+        self.created = created or datetime.datetime.now().isoformat()
+        self.from_date = from_date
+        self.to_date = to_date
+        self.downloads_dir = downloads_dir
+
+    @classmethod
+    def build(
+        cls,
+        meetings: tp.Iterable[Meeting],
+        path_manager: PathManager,
+        state: DownloadState,
+        rules: tp.Optional[SelectionRules] = None,
+        **kwargs,
+    ) -> 'Plan':
+        meetings = list(meetings)
+        files = []
+        for meeting in meetings:
+            pending = {
+                file_key(meeting, rfile)
+                for rfile in pending_files(path_manager, state, meeting, rules)
+            }
+            month = '{:%Y-%m}'.format(meeting.start_time)
+            for rfile in downloadable_files(meeting, rules):
+                key = file_key(meeting, rfile)
+                files.append(PlannedFile(
+                    key,
+                    meeting.uuid,
+                    month,
+                    rfile.file_type.value,
+                    rfile.file_size or 0,
+                    key not in pending,
+                ))
+        downloads_dir = os.path.abspath(path_manager.prefix)
+        return cls(meetings, files, downloads_dir=downloads_dir, **kwargs)
+
+    def selection(self) -> PlannedSelection:
+        return PlannedSelection(planned.key for planned in self.files)
+
+    def totals(self) -> tp.Dict[tp.Tuple[str, str], Totals]:
+        """Totals by month and file type, in that order"""
+        result = {}
+        for planned in self.files:
+            key = (planned.month, planned.file_type)
+            result.setdefault(key, Totals()).add(planned)
+        return dict(sorted(result.items()))
+
+    def total(self) -> Totals:
+        result = Totals()
+        for planned in self.files:
+            result.add(planned)
+        return result
+
+    def format(self, throughput: tp.Optional[float] = None) -> str:
+        """Table of `totals', ETA from `throughput' in bytes per second"""
+        fmt = '{:7} | {:10} | {:>5} | {:>10} | {:>5} | {:>10}'
+        lines = [fmt.format(
+            'Month', 'Type', 'Files', 'Size', 'Local', 'Local size')]
+        rows = list(self.totals().items())
+        rows.append((('Total', ''), self.total()))
+        for (month, file_type), totals in rows:
+            lines.append(fmt.format(
+                month,
+                file_type,
+                totals.files,
+                format_size(totals.size),
+                totals.present_files,
+                format_size(totals.present_size),
+            ))
+
+        total = self.total()
+        summary = 'Meetings: {}, to download: {} files, {}'.format(
+            len(self.meetings),
+            total.files - total.present_files,
+            format_size(total.missing_size),
+        )
+        if throughput:
+            eta = datetime.timedelta(
+                seconds=round(total.missing_size / throughput))
+            summary += ', ETA {} at {}/s measured by earlier runs'.format(
+                eta, format_size(throughput))
+        else:
+            summary += ', ETA unknown until a download has run'
+        lines.append(summary)
+        return '\n'.join(lines)
+
+    def write(self, path: str) -> None:
+        body = {
+            'version': PLAN_VERSION,
+            'created': self.created,
+            'from_date': self.from_date,
+            'to_date': self.to_date,
+            'downloads_dir': self.downloads_dir,
+            'meetings': [json.loads(m.json()) for m in self.meetings],
+            'files': [f._asdict() for f in self.files],
+        }
+        with open(path, 'w') as f:
+            json.dump(body, f, indent=2)
+
+    @classmethod
+    def read(cls, path: str) -> 'Plan':
+        with open(path) as f:
+            body = json.load(f)
+        if body.get('version') != PLAN_VERSION:
+            raise ValueError('Unsupported plan version {!r} in {}'.format(
+                body.get('version'), path))
+        logging.info('Plan %s created %s for %s..%s',
+                     path, body['created'], body['from_date'],
+                     body['to_date'])
+        return cls(
+            [Meeting(**meeting) for meeting in body['meetings']],
+            [PlannedFile(**planned) for planned in body['files']],
+            body['created'],
+            body['from_date'],
+            body['to_date'],
+            body['downloads_dir'],
+        )
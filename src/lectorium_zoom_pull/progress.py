@@ -0,0 +1,131 @@
+import re
+import sys
+import threading
+import time
+import typing as tp
+
+
+def format_size(num_bytes: float) -> str:
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if abs(num_bytes) < 1024:
+            return f'{num_bytes:.1f} {unit}'
+        num_bytes /= 1024
+    return f'{num_bytes:.1f} TiB'
+
+
+SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+_SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?', re.IGNORECASE)
+
+
+def parse_size(text: str) -> float:
+    """Bytes from e.g. `500K', `20M', `1.5GiB', binary units"""
+    match = _SIZE_RE.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(f'Invalid size: {text!r}')
+    return float(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
+
+
+class Transfer:
+    """Byte counter of a single file, owned by `ProgressBoard'"""
+
+    def __init__(
+        self,
+        board: 'ProgressBoard',
+        label: str,
+        total: int,
+        initial: int = 0,
+    ):
+        self.board = board
+        self.label = label
+        self.total = total
+        self.initial = initial
+        self.done = initial
+        self.started = time.monotonic()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished or time.monotonic()
+        return max(end - self.started, 1e-6)
+
+    @property
+    def transferred(self) -> int:
+        """Bytes received by this transfer, excluding resumed prefix"""
+        return self.done - self.initial
+
+    @property
+    def rate(self) -> float:
+        """Bytes per second"""
+        return self.transferred / self.elapsed
+
+    def update(self, num_bytes: int) -> None:
+        with self._lock:
+            self.done += num_bytes
+        self.board.refresh()
+
+    def close(self) -> None:
+        self.finished = time.monotonic()
+        self.board.remove(self)
+
+    def describe(self) -> str:
+        if self.total:
+            percent = '{:3.0f}%'.format(100 * self.done / self.total)
+        else:
+            percent = format_size(self.done)
+        return '{} {} {}/s'.format(
+            self.label, percent, format_size(self.rate))
+
+
+class ProgressBoard:
+    """Single status line for all active transfers, safe to share
+
+    Nothing is rendered unless `enabled'
+    """
+
+    def __init__(
+        self,
+        stream: tp.TextIO = sys.stderr,
+        interval: float = 0.5,
+    ):
+        self.stream = stream
+        self.interval = interval
+        self.enabled = False
+        self._transfers = []
+        self._lock = threading.Lock()
+        self._last_render = 0.0
+        self._last_width = 0
+
+    def start(self, label: str, total: int, initial: int = 0) -> Transfer:
+        transfer = Transfer(self, label, total, initial)
+        with self._lock:
+            self._transfers.append(transfer)
+        self.refresh(force=True)
+        return transfer
+
+    def remove(self, transfer: Transfer) -> None:
+        with self._lock:
+            self._transfers.remove(transfer)
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> None:
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_render < self.interval:
+            return
+
+        with self._lock:
+            self._last_render = now
+            line = ' | '.join(t.describe() for t in self._transfers)
+            padding = ' ' * max(self._last_width - len(line), 0)
+            self._last_width = len(line)
+            self.stream.write('\r' + line + padding)
+            if not line:
+                self.stream.write('\r')
+            self.stream.flush()
+
+
+board = ProgressBoard()
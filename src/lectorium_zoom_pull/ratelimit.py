@@ -0,0 +1,184 @@
+import datetime
+import email.utils
+import logging
+import random
+import threading
+import time
+import typing as tp
+
+import requests
+
+from lectorium_zoom_pull import metrics
+from lectorium_zoom_pull.config import Config
+
+
+CATEGORIES = ['list', 'trash', 'download']
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class QuotaExceeded(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    """Allows `rate' acquisitions per second with bursts up to `burst'"""
+
+    def __init__(self, rate: float, burst: tp.Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Blocks until allowed, return value: seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = max(-self._tokens / self.rate, self._paused_until - now)
+
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+    def pause(self, seconds: float) -> None:
+        """Nobody acquires for the next `seconds'"""
+        with self._lock:
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + seconds)
+
+
+def retry_after(rsp: requests.Response) -> tp.Optional[float]:
+    """Seconds from `Retry-After', which is either a delay or a date"""
+    value = rsp.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            when = datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+        except ValueError:
+            logging.warning('Unparsable Retry-After: %s', value)
+            return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max((when - now).total_seconds(), 0.0)
+
+
+class RequestScheduler:
+    """Rate limits and retries API requests per category
+
+    Throttled requests are retried with jittered exponential backoff,
+    or after `Retry-After' when API provides one. Once API reports
+    an exhausted daily limit, the category fails fast until the limit resets
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.buckets = {
+            'list': TokenBucket(config.rate_limit_list),
+            'trash': TokenBucket(config.rate_limit_trash),
+            'download': TokenBucket(config.rate_limit_download),
+        }
+        self._exhausted_until = {}
+        self._lock = threading.Lock()
+        self.requests = {category: 0 for category in CATEGORIES}
+        self.retries = {category: 0 for category in CATEGORIES}
+        self.throttled_seconds = {category: 0.0 for category in CATEGORIES}
+
+    def _count(self, counter: dict, category: str, value=1) -> None:
+        with self._lock:
+            counter[category] += value
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(
+            self.config.retry_backoff * 2 ** attempt,
+            self.config.retry_backoff_max,
+        )
+        return random.uniform(delay / 2, delay)
+
+    def _check_quota(self, category: str) -> None:
+        exhausted_until = self._exhausted_until.get(category)
+        if exhausted_until and time.monotonic() < exhausted_until:
+            raise QuotaExceeded(f'Daily limit for {category} requests')
+
+    def send(
+        self,
+        category: str,
+        do_request: tp.Callable[[], requests.Response],
+    ) -> requests.Response:
+        bucket = self.buckets[category]
+        max_retries = self.config.max_retries
+
+        attempt = -1
+        while True:
+            attempt += 1
+            self._check_quota(category)
+            self._count(self.throttled_seconds, category, bucket.acquire())
+            self._count(self.requests, category)
+
+            started = time.monotonic()
+            try:
+                rsp = do_request()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.run.observe_request(
+                    category, time.monotonic() - started, type(e).__name__)
+                if attempt == max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(
+                    'Retrying %s request in %.1fs: %s', category, delay, e)
+                self._count(self.retries, category)
+                time.sleep(delay)
+                continue
+            metrics.run.observe_request(
+                category, time.monotonic() - started, str(rsp.status_code))
+
+            if rsp.status_code not in RETRY_STATUSES:
+                return rsp
+
+            delay = retry_after(rsp)
+            limit_type = rsp.headers.get('X-RateLimit-Type', '')
+            if rsp.status_code == 429 and 'daily' in limit_type.lower():
+                self._exhausted_until[category] = (
+                    time.monotonic() + (delay or 24 * 3600))
+                raise QuotaExceeded(
+                    f'Daily limit for {category} requests: {rsp.text}')
+
+            if attempt == max_retries:
+                return rsp
+
+            if delay is None:
+                delay = self._backoff(attempt)
+            if rsp.status_code == 429:
+                # Slow down every thread sharing the category
+                bucket.pause(delay)
+            logging.warning(
+                'Retrying %s request in %.1fs: status %d',
+                category, delay, rsp.status_code
+            )
+            self._count(self.retries, category)
+            if rsp.status_code != 429:
+                time.sleep(delay)
+
+    def summary(self) -> str:
+        return ', '.join(
+            '{}: {} requests, {} retries, {:.1f}s throttled'.format(
+                category,
+                self.requests[category],
+                self.retries[category],
+                self.throttled_seconds[category],
+            )
+            for category in CATEGORIES
+        )
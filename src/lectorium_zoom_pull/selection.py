@@ -0,0 +1,179 @@
+import json
+import typing as tp
+
+from lectorium_zoom_pull.filters import Predicate, make_meeting_filter
+from lectorium_zoom_pull.models import FileType, Meeting, RecordingFile
+from lectorium_zoom_pull.progress import parse_size
+
+
+DEFAULT_FILE_TYPES = frozenset({FileType.MP4, FileType.M4A, FileType.CHAT})
+
+# Keys of a rule that select meetings, same as meeting filter options
+MATCH_KEYS = (
+    'meeting_ids',
+    'topic_contains',
+    'not_topic_contains',
+    'topic_regex',
+    'host_email_contains',
+    'host_email_regex',
+)
+SELECTION_KEYS = ('file_types', 'recording_types', 'min_size', 'max_size')
+
+
+def _names(value: tp.Union[str, tp.Iterable[str], None]) -> tp.List[str]:
+    """Names from a comma-separated string or a list"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value if name.strip()]
+
+
+def _size(value: tp.Union[str, int, None]) -> tp.Optional[int]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return int(parse_size(value))
+    return int(value)
+
+
+class FileSelection:
+    """Which downloadable recording files of a meeting to fetch
+
+    Files pass if their type is one of `file_types', their recording
+    type is one of `recording_types', if set, and their size reported
+    by API is within limits. Files of unknown size are not limited
+    """
+
+    def __init__(
+        self,
+        file_types: tp.AbstractSet[FileType] = DEFAULT_FILE_TYPES,
+        recording_types: tp.Optional[tp.AbstractSet[str]] = None,
+        min_size: tp.Optional[int] = None,
+        max_size: tp.Optional[int] = None,
+    ):
+        self.file_types = frozenset(file_types)
+        self.recording_types = \
+            frozenset(recording_types) if recording_types else None
+        self.min_size = min_size
+        self.max_size = max_size
+
+    @classmethod
+    def parse(
+        cls,
+        file_types: tp.Union[str, tp.Iterable[str], None] = None,
+        recording_types: tp.Union[str, tp.Iterable[str], None] = None,
+        min_size: tp.Union[str, int, None] = None,
+        max_size: tp.Union[str, int, None] = None,
+        base: tp.Optional['FileSelection'] = None,
+    ) -> 'FileSelection':
+        """Selection from option values, e.g. `M4A,CHAT' and `2G'
+
+        Options that are not set are taken from `base', if given
+        """
+        base = base or cls()
+        selected = base.file_types
+        names = _names(file_types)
+        if names:
+            known = {t.value: t for t in FileType}
+            unknown = [n for n in names if n.upper() not in known]
+            if unknown:
+                raise ValueError('Unknown file types {}, expected {}'.format(
+                    ', '.join(unknown), ', '.join(known)))
+            selected = {known[n.upper()] for n in names}
+        recording = _names(recording_types) or base.recording_types
+        minimum = _size(min_size)
+        maximum = _size(max_size)
+        return cls(
+            selected,
+            recording,
+            base.min_size if minimum is None else minimum,
+            base.max_size if maximum is None else maximum,
+        )
+
+    def __call__(self, rfile: RecordingFile) -> bool:
+        if rfile.file_type not in self.file_types:
+            return False
+        if self.recording_types is not None \
+                and rfile.recording_type not in self.recording_types:
+            return False
+        if rfile.file_size is not None:
+            if self.min_size is not None and rfile.file_size < self.min_size:
+                return False
+            if self.max_size is not None and rfile.file_size > self.max_size:
+                return False
+        return True
+
+
+DEFAULT_SELECTION = FileSelection()
+
+
+class SelectionRules:
+    """Per-course selections, the first rule matching a meeting wins
+
+    Meetings no rule matches get `default'
+    """
+
+    def __init__(
+        self,
+        default: FileSelection,
+        rules: tp.Sequence[tp.Tuple[Predicate, FileSelection]] = (),
+    ):
+        self.default = default
+        self.rules = list(rules)
+
+    def for_meeting(self, meeting: Meeting) -> FileSelection:
+        for predicate, selection in self.rules:
+            if predicate(meeting):
+                return selection
+        return self.default
+
+    @classmethod
+    def load(cls, path: str, default: FileSelection) -> 'SelectionRules':
+        """Rules from a JSON list of objects with `MATCH_KEYS' to select
+        meetings and `SELECTION_KEYS' overriding `default'
+        """
+        with open(path) as f:
+            body = json.load(f)
+        if not isinstance(body, list):
+            raise ValueError(f'Expected a list of rules in {path}')
+
+        rules = []
+        for idx, rule in enumerate(body):
+            unknown = set(rule) - set(MATCH_KEYS) - set(SELECTION_KEYS)
+            if unknown:
+                raise ValueError('Unknown keys {} in rule {} of {}'.format(
+                    ', '.join(sorted(unknown)), idx + 1, path))
+            match = {key: rule[key] for key in MATCH_KEYS if key in rule}
+            if isinstance(match.get('meeting_ids'), list):
+                match['meeting_ids'] = ','.join(map(str, match['meeting_ids']))
+            for key in ['topic_contains', 'not_topic_contains',
+                        'host_email_contains']:
+                if isinstance(match.get(key), str):
+                    match[key] = [match[key]]
+            if not match:
+                raise ValueError(
+                    f'Rule {idx + 1} of {path} matches every meeting')
+            rules.append((
+                make_meeting_filter(**match),
+                FileSelection.parse(
+                    **{k: rule[k] for k in SELECTION_KEYS if k in rule},
+                    base=default,
+                ),
+            ))
+        return cls(default, rules)
+
+
+def selection_rules(
+    file_types: tp.Optional[str] = None,
+    recording_types: tp.Optional[str] = None,
+    min_size: tp.Optional[str] = None,
+    max_size: tp.Optional[str] = None,
+    rules_path: tp.Optional[str] = None,
+) -> SelectionRules:
+    """Rules from command options, see `FileSelection.parse'"""
+    default = FileSelection.parse(
+        file_types, recording_types, min_size, max_size)
+    if rules_path:
+        return SelectionRules.load(rules_path, default)
+    return SelectionRules(default)
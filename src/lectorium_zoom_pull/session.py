@@ -0,0 +1,97 @@
+import functools
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+
+from lectorium_zoom_pull.auth import access_token, token_provider
+from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.ratelimit import RequestScheduler
+
+
+class BearerAuth(AuthBase):
+    def __init__(self, config: Config):
+        self.config = config
+
+    def __call__(self, request):
+        token = access_token(self.config)
+        request.headers['Authorization'] = f'Bearer {token}'
+        return request
+
+
+class ZoomSession(requests.Session):
+    """Keep-alive session for Zoom API
+
+    Relative urls are resolved against `config.api_base_url'.
+    Requests with a `category' go through the shared `RequestScheduler'.
+    A request rejected with 401 is retried once with a new access token,
+    the cached one may have been revoked before its expiration
+    """
+
+    def __init__(self, config: Config):
+        super().__init__()
+        self.config = config
+        self.base_url = config.api_base_url.rstrip('/')
+        self.auth = BearerAuth(config)
+        self.scheduler = RequestScheduler(config)
+        self.headers.update({
+            'Content-Type': 'application/json',
+        })
+        mount_pool(self, config.http_pool_size)
+
+    def request(self, method, url, *args, category=None, **kwargs):
+        if url.startswith('/'):
+            url = self.base_url + url
+        rsp = self._send(method, url, args, kwargs, category)
+        if rsp.status_code != 401:
+            return rsp
+
+        logging.warning('Access token rejected, issuing a new one')
+        token_provider(self.config).invalidate()
+        params = kwargs.get('params')
+        if isinstance(params, dict) and 'access_token' in params:
+            kwargs['params'] = dict(
+                params, access_token=access_token(self.config))
+        return self._send(method, url, args, kwargs, category)
+
+    def _send(self, method, url, args, kwargs, category):
+        send = functools.partial(
+            super().request, method, url, *args, **kwargs)
+        if category is None:
+            return send()
+        return self.scheduler.send(category, send)
+
+
+def mount_pool(session: requests.Session, pool_size: int) -> None:
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+_api_session = None
+_cdn_session = None
+_lock = threading.Lock()
+
+
+def api_session(config: Config) -> ZoomSession:
+    """Process-wide session for API calls, shared between threads"""
+    global _api_session
+    with _lock:
+        if _api_session is None or _api_session.config is not config:
+            _api_session = ZoomSession(config)
+        return _api_session
+
+
+def cdn_session(config: Config) -> requests.Session:
+    """Process-wide session for file transfers, no API credentials"""
+    global _cdn_session
+    with _lock:
+        if _cdn_session is None:
+            _cdn_session = requests.Session()
+            mount_pool(_cdn_session, config.http_pool_size)
+        return _cdn_session
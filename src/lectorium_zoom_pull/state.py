@@ -0,0 +1,244 @@
+import datetime
+import os.path
+import sqlite3
+import threading
+import typing as tp
+from enum import Enum
+
+from lectorium_zoom_pull.models import Meeting, RecordingFile
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    meeting_uuid TEXT NOT NULL,
+    meeting_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    path TEXT,
+    size INTEGER,
+    updated_at TEXT NOT NULL,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS files_by_meeting ON files (meeting_uuid);
+CREATE INDEX IF NOT EXISTS files_by_state ON files (state);
+CREATE TABLE IF NOT EXISTS runs (
+    started REAL NOT NULL,
+    seconds REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    files INTEGER NOT NULL
+);
+'''
+
+
+class FileState(str, Enum):
+    PENDING = 'pending'
+    IN_PROGRESS = 'in_progress'
+    COMPLETE = 'complete'
+    TRASHED = 'trashed'
+
+
+DONE_STATES = {FileState.COMPLETE, FileState.TRASHED}
+
+
+class FileRecord(tp.NamedTuple):
+    id: str
+    meeting_uuid: str
+    meeting_id: str
+    state: FileState
+    path: tp.Optional[str]
+    size: tp.Optional[int]
+    sha256: tp.Optional[str] = None
+
+
+RECORD_COLUMNS = 'id, meeting_uuid, meeting_id, state, path, size, sha256'
+
+
+def _record(row: tuple) -> FileRecord:
+    return FileRecord(*row[:3], FileState(row[3]), *row[4:])
+
+
+def file_key(meeting: Meeting, rfile: RecordingFile) -> str:
+    if rfile.id:
+        return rfile.id
+    return '{}/{}'.format(meeting.uuid, meeting.recording_files.index(rfile))
+
+
+class DownloadState:
+    """Journal of every recording file ever scheduled for download
+
+    Paths are stored relative to the downloads directory. Safe to share
+    between threads, every update is committed right away
+    """
+    FILENAME = '.lzp-state.sqlite'
+
+    def __init__(self, downloads_dir: str, path: tp.Optional[str] = None):
+        self.downloads_dir = downloads_dir
+        self.path = path or os.path.join(downloads_dir, self.FILENAME)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.executescript(SCHEMA)
+        columns = [
+            row[1] for row in self.db.execute('PRAGMA table_info(files)')
+        ]
+        if 'sha256' not in columns:
+            # Journal created before digests were recorded
+            self.db.execute('ALTER TABLE files ADD COLUMN sha256 TEXT')
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
+
+    def meeting_files(self, meeting: Meeting) -> tp.Dict[str, FileRecord]:
+        with self._lock:
+            rows = self.db.execute(
+                f'SELECT {RECORD_COLUMNS} FROM files WHERE meeting_uuid = ?',
+                (meeting.uuid,)
+            ).fetchall()
+        return {row[0]: _record(row) for row in rows}
+
+    def unfinished(self) -> tp.List[FileRecord]:
+        with self._lock:
+            rows = self.db.execute(
+                f'SELECT {RECORD_COLUMNS} FROM files WHERE state IN (?, ?)',
+                (FileState.PENDING.value, FileState.IN_PROGRESS.value)
+            ).fetchall()
+        return [_record(row) for row in rows]
+
+    def downloaded(self) -> tp.List[FileRecord]:
+        """Complete and trashed files with known paths"""
+        with self._lock:
+            rows = self.db.execute(
+                f'SELECT {RECORD_COLUMNS} FROM files '
+                'WHERE state IN (?, ?) AND path IS NOT NULL ORDER BY path',
+                (FileState.COMPLETE.value, FileState.TRASHED.value)
+            ).fetchall()
+        return [_record(row) for row in rows]
+
+    def record_run(
+        self,
+        started: float,
+        seconds: float,
+        size: int,
+        files: int,
+    ) -> None:
+        """Remember throughput of a download batch, see `throughput'"""
+        with self._lock, self.db:
+            self.db.execute(
+                'INSERT INTO runs (started, seconds, bytes, files) '
+                'VALUES (?, ?, ?, ?)',
+                (started, seconds, size, files)
+            )
+
+    def throughput(self, runs: int = 10) -> tp.Optional[float]:
+        """Bytes per second over the last `runs' batches, None if unknown"""
+        with self._lock:
+            size, seconds = self.db.execute(
+                'SELECT sum(bytes), sum(seconds) FROM ('
+                'SELECT bytes, seconds FROM runs '
+                'ORDER BY started DESC LIMIT ?)',
+                (runs,)
+            ).fetchone()
+        if not size or not seconds:
+            return None
+        return size / seconds
+
+    def set_digest(self, key: str, sha256: str) -> None:
+        with self._lock, self.db:
+            self.db.execute(
+                'UPDATE files SET sha256 = ? WHERE id = ?', (sha256, key))
+
+    def update(
+        self,
+        meeting: Meeting,
+        rfiles: tp.Iterable[RecordingFile],
+        state: FileState,
+        abs_path: tp.Optional[str] = None,
+        size: tp.Optional[int] = None,
+        sha256: tp.Optional[str] = None,
+    ) -> None:
+        path = None
+        if abs_path is not None:
+            path = os.path.relpath(abs_path, start=self.downloads_dir)
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        rows = [
+            (
+                file_key(meeting, rfile),
+                meeting.uuid,
+                meeting.id,
+                state.value,
+                path,
+                size,
+                now,
+                sha256,
+            )
+            for rfile in rfiles
+        ]
+        with self._lock, self.db:
+            self.db.executemany(
+                'INSERT INTO files (id, meeting_uuid, meeting_id, state, '
+                'path, size, updated_at, sha256) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET '
+                'state = excluded.state, '
+                'path = coalesce(excluded.path, path), '
+                'size = coalesce(excluded.size, size), '
+                'sha256 = coalesce(excluded.sha256, sha256), '
+                'updated_at = excluded.updated_at',
+                rows
+            )
+
+    def mark_trashed(self, meeting: Meeting) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self._lock, self.db:
+            self.db.execute(
+                'UPDATE files SET state = ?, updated_at = ? '
+                'WHERE meeting_uuid = ? AND state = ?',
+                (
+                    FileState.TRASHED.value,
+                    now,
+                    meeting.uuid,
+                    FileState.COMPLETE.value,
+                )
+            )
+
+    def verify_on_disk(
+        self,
+        meeting: Meeting,
+        rfiles: tp.Iterable[RecordingFile],
+    ) -> tp.List[str]:
+        """Return value: problems preventing `rfiles' from being trashed
+
+        Files need a recorded path and a digest, computed while they were
+        written or recorded by `verify' command. Files adopted without a
+        path by older versions are never trusted
+        """
+        journal = self.meeting_files(meeting)
+        problems = []
+        for rfile in rfiles:
+            key = file_key(meeting, rfile)
+            record = journal.get(key)
+            if record is None or record.state not in DONE_STATES:
+                problems.append(f'{key} is not downloaded')
+                continue
+            if record.path is None:
+                problems.append(f'{key} has no recorded path')
+                continue
+
+            abs_path = os.path.join(self.downloads_dir, record.path)
+            try:
+                size = os.path.getsize(abs_path)
+            except OSError:
+                problems.append(f'{key} is missing at {abs_path}')
+                continue
+
+            for expected in [record.size, rfile.file_size]:
+                if expected is not None and expected != size:
+                    problems.append(
+                        f'{key} has {size} bytes, expected {expected}')
+                    break
+            else:
+                if record.sha256 is None:
+                    problems.append(f'{key} has no checksum')
+        return problems
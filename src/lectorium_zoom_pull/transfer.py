@@ -0,0 +1,438 @@
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import json
+import logging
+import os
+import threading
+import typing as tp
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from lectorium_zoom_pull.progress import Transfer, board, format_size
+
+
+CHUNK_SIZE = 1 << 20
+PART_SUFFIX = '.part'
+SEGMENTS_SUFFIX = '.segments'
+
+# Interruptions that leave a resumable part file behind
+TRANSIENT_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+def _file_size(path: str) -> tp.Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return None
+
+
+# fallocate(2) mode allocating blocks past end of file, Linux only
+FALLOC_FL_KEEP_SIZE = 0x01
+
+_fallocate = None
+_fallocate_loaded = False
+
+
+def reserve_blocks(fd: int, offset: int, length: int) -> bool:
+    """Allocate disk blocks for a file that is written sequentially
+
+    Unlike `os.posix_fallocate', file size is kept, so the size of
+    a part file still tells how much of it has been written. Running
+    out of space raises `OSError' right away rather than midway
+
+    Return value: False if not supported by the system or filesystem
+    """
+    global _fallocate, _fallocate_loaded
+    if length <= 0:
+        return True
+    if not _fallocate_loaded:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            _fallocate = libc.fallocate
+            _fallocate.argtypes = [
+                ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+        except (OSError, AttributeError):
+            _fallocate = None
+        _fallocate_loaded = True
+    if _fallocate is None:
+        return False
+
+    if _fallocate(fd, FALLOC_FL_KEEP_SIZE, offset, length) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+        return False
+    raise OSError(error, os.strerror(error))
+
+
+# Called with the size of every received chunk, blocks to limit bandwidth
+Throttle = tp.Callable[[int], tp.Any]
+
+
+class RangeUnsupported(Exception):
+    pass
+
+
+class Downloaded(tp.NamedTuple):
+    size: int
+    sha256: str
+    # Bytes received from network, excluding resumed parts
+    transferred: int = 0
+
+
+def sha256_file(
+    path: str,
+    limit: tp.Optional[int] = None,
+) -> 'hashlib._Hash':
+    """Hash of the first `limit' bytes of `path', of the whole by default"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = CHUNK_SIZE if remaining is None \
+                else min(CHUNK_SIZE, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher
+
+
+def _unlimited(size: int) -> None:
+    pass
+
+
+def stream_to_file(
+    session: requests.Session,
+    url: str,
+    path: str,
+    label: str,
+    expected_size: tp.Optional[int] = None,
+    segments: int = 1,
+    retries: int = 0,
+    throttle: tp.Optional[Throttle] = None,
+) -> Downloaded:
+    """Download `url' to `path' through `path + PART_SUFFIX'
+
+    An existing part file is resumed with a Range request. The part file
+    is renamed to `path' only once its size matches `expected_size'.
+    With known `expected_size', up to `segments' byte ranges are fetched
+    in parallel. A dropped connection is resumed up to `retries' times.
+    `throttle' is called with the size of every received chunk.
+    SHA-256 is computed while the file is being written
+
+    Return value: size and digest of the complete file
+    """
+    # Transfers of every attempt, interrupted ones included
+    transfers = []
+    for attempt in range(retries + 1):
+        try:
+            downloaded = _download(
+                session, url, path, label, expected_size, segments,
+                throttle or _unlimited, transfers)
+            return downloaded._replace(
+                transferred=sum(t.transferred for t in transfers))
+        except TRANSIENT_ERRORS as e:
+            if attempt == retries:
+                raise
+            logging.warning('Resuming interrupted %s: %s', label, e)
+
+
+def _download(
+    session: requests.Session,
+    url: str,
+    path: str,
+    label: str,
+    expected_size: tp.Optional[int],
+    segments: int,
+    throttle: Throttle,
+    transfers: tp.List[Transfer],
+) -> Downloaded:
+    part_path = path + PART_SUFFIX
+    segments_path = part_path + SEGMENTS_SUFFIX
+
+    size = _file_size(path)
+    if size is not None and expected_size in (None, size):
+        logging.info('Already downloaded %s', label)
+        return Downloaded(size, sha256_file(path).hexdigest())
+
+    if os.path.exists(segments_path):
+        use_segments = True
+    else:
+        # A part file without segments journal came from a single stream
+        use_segments = segments > 1 and not os.path.exists(part_path)
+
+    if expected_size and use_segments:
+        try:
+            hasher = _fetch_segmented(
+                session, url, part_path, label, expected_size, segments,
+                throttle, transfers)
+            os.replace(part_path, path)
+            return Downloaded(expected_size, hasher.hexdigest())
+        except RangeUnsupported:
+            logging.warning('Range ignored for %s, using one stream', label)
+            for stale_path in [segments_path, part_path]:
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+
+    offset = _file_size(part_path) or 0
+    if expected_size is not None and offset > expected_size:
+        logging.warning(
+            'Discarding %s: %d bytes, expected %d',
+            part_path, offset, expected_size
+        )
+        offset = 0
+    if expected_size is None or offset < expected_size:
+        offset, hasher = _fetch(
+            session, url, part_path, label, offset, expected_size, throttle,
+            transfers)
+    else:
+        # Complete part file left by an interrupted rename
+        hasher = sha256_file(part_path, offset)
+
+    if expected_size is not None and offset != expected_size:
+        # Keep the part file, next run resumes it
+        raise RuntimeError(
+            f'Incomplete download of {label}: '
+            f'{offset} of {expected_size} bytes'
+        )
+
+    os.replace(part_path, path)
+    return Downloaded(offset, hasher.hexdigest())
+
+
+def _fetch(
+    session: requests.Session,
+    url: str,
+    part_path: str,
+    label: str,
+    offset: int,
+    expected_size: tp.Optional[int],
+    throttle: Throttle,
+    transfers: tp.List[Transfer],
+) -> tp.Tuple[int, 'hashlib._Hash']:
+    """Return value: size and hash of the part file after the transfer
+
+    Resumed part is hashed from disk before the transfer continues.
+    The transfer is appended to `transfers'
+    """
+    headers = {}
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        logging.info('Resuming %s from byte %d', label, offset)
+
+    with session.get(url, headers=headers, stream=True) as rsp:
+        if rsp.status_code == 416:
+            logging.warning('Range not satisfiable for %s, restarting', label)
+            return _fetch(
+                session, url, part_path, label, 0, expected_size, throttle,
+                transfers)
+        rsp.raise_for_status()
+
+        if offset and rsp.status_code != 206:
+            logging.warning('Range ignored for %s, restarting', label)
+            offset = 0
+        hasher = sha256_file(part_path, offset) if offset \
+            else hashlib.sha256()
+
+        transfer = board.start(label, expected_size or 0, initial=offset)
+        transfers.append(transfer)
+        try:
+            with open(part_path, 'r+b' if offset else 'wb') as f:
+                f.seek(offset)
+                f.truncate()
+                if expected_size:
+                    reserve_blocks(
+                        f.fileno(), offset, expected_size - offset)
+                for chunk in rsp.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    transfer.update(len(chunk))
+                    throttle(len(chunk))
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            transfer.close()
+
+    logging.info(
+        'Downloaded %s: %s in %.1fs, %s/s',
+        label,
+        format_size(transfer.transferred),
+        transfer.elapsed,
+        format_size(transfer.rate),
+    )
+    return transfer.done, hasher
+
+
+def _split(size: int, count: int) -> tp.List[tp.List[int]]:
+    """Inclusive byte ranges [first, last] covering `size' bytes"""
+    step = -(-size // count)
+    return [
+        [first, min(first + step, size) - 1]
+        for first in range(0, size, step)
+    ]
+
+
+def _fetch_segmented(
+    session: requests.Session,
+    url: str,
+    part_path: str,
+    label: str,
+    size: int,
+    segments: int,
+    throttle: Throttle,
+    transfers: tp.List[Transfer],
+) -> 'hashlib._Hash':
+    """Fill preallocated `part_path' with parallel Range requests
+
+    Finished ranges are journaled next to the part file once their bytes
+    are synced to disk, an interrupted download refetches only the
+    remaining ones. The file is hashed by a follower thread, which reads
+    the contiguous written prefix while it is still in page cache
+
+    Return value: hash of the whole file
+    """
+    segments_path = part_path + SEGMENTS_SUFFIX
+
+    state = None
+    if os.path.exists(segments_path) and _file_size(part_path) == size:
+        with open(segments_path) as f:
+            state = json.load(f)
+    if not state or state['size'] != size:
+        state = {'size': size, 'ranges': _split(size, segments), 'done': []}
+
+    pending = [
+        i for i in range(len(state['ranges'])) if i not in state['done']
+    ]
+    initial = size - sum(
+        state['ranges'][i][1] - state['ranges'][i][0] + 1 for i in pending
+    )
+    if initial:
+        logging.info(
+            'Resuming %s, %d of %d segments left',
+            label, len(pending), len(state['ranges'])
+        )
+
+    journal_lock = threading.Lock()
+
+    # Bytes written at the start of every pending range
+    written = {i: 0 for i in pending}
+    finished = set(state['done'])
+    hashed = threading.Condition()
+    stopped = False
+
+    def frontier() -> int:
+        """End of contiguous written prefix"""
+        for index, (first, last) in enumerate(state['ranges']):
+            if index not in finished:
+                return first + written.get(index, 0)
+        return size
+
+    def follow(fd: int) -> 'hashlib._Hash':
+        hasher = hashlib.sha256()
+        offset = 0
+        while offset < size:
+            with hashed:
+                end = frontier()
+                while end <= offset and not stopped:
+                    hashed.wait()
+                    end = frontier()
+                if stopped:
+                    return hasher
+            while offset < end:
+                chunk = os.pread(fd, min(CHUNK_SIZE, end - offset), offset)
+                hasher.update(chunk)
+                offset += len(chunk)
+        return hasher
+
+    def save_state():
+        tmp_path = segments_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, segments_path)
+
+    def fetch_range(fd: int, transfer, index: int) -> None:
+        first, last = state['ranges'][index]
+        headers = {'Range': f'bytes={first}-{last}'}
+        with session.get(url, headers=headers, stream=True) as rsp:
+            rsp.raise_for_status()
+            if rsp.status_code != 206:
+                raise RangeUnsupported(url)
+
+            offset = first
+            for chunk in rsp.iter_content(chunk_size=CHUNK_SIZE):
+                chunk = chunk[:last + 1 - offset]
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+                with hashed:
+                    written[index] = offset - first
+                    hashed.notify()
+                transfer.update(len(chunk))
+                throttle(len(chunk))
+
+        if offset != last + 1:
+            raise RuntimeError(
+                f'Short segment of {label}: {first}-{last}, got to {offset}')
+        # A range is journaled only once its bytes are on disk, otherwise
+        # a crash could leave a hole that resume would skip
+        os.fsync(fd)
+        with journal_lock:
+            state['done'].append(index)
+            save_state()
+        with hashed:
+            finished.add(index)
+            hashed.notify()
+
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+        save_state()
+
+        transfer = board.start(label, size, initial=initial)
+        transfers.append(transfer)
+        try:
+            with ThreadPoolExecutor(max_workers=segments + 1) as executor:
+                follower = executor.submit(follow, fd)
+                futures = [
+                    executor.submit(fetch_range, fd, transfer, i)
+                    for i in pending
+                ]
+                try:
+                    for future in futures:
+                        future.result()
+                finally:
+                    with hashed:
+                        stopped = any(f.exception() for f in futures)
+                        hashed.notify()
+                hasher = follower.result()
+        finally:
+            transfer.close()
+
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    os.remove(segments_path)
+    logging.info(
+        'Downloaded %s in %d segments: %s in %.1fs, %s/s',
+        label,
+        len(state['ranges']),
+        format_size(transfer.transferred),
+        transfer.elapsed,
+        format_size(transfer.rate),
+    )
+    return hasher
@@ -0,0 +1,90 @@
+"""Compiled filters against the former list-of-lambdas implementation
+
+Run as `python -m tests.bench_meeting_filters [MEETINGS]`
+"""
+import random
+import re
+import sys
+import timeit
+import types
+
+from lectorium_zoom_pull.filters import Filter
+
+
+WORDS = [
+    'Алгоритмы', 'и', 'структуры', 'данных', 'Общая', 'физика',
+    'семестр', 'ФПМИ', 'лекция', 'семинар', 'Mathematical', 'Analysis',
+]
+
+
+def legacy_filter(course_codes, excluded, expression):
+    """Filter as built before compilation, kept for comparison"""
+    def topic_contains(substrings):
+        substrings = list(map(str.lower, substrings))
+        return lambda meeting: any(
+            meeting.topic.lower().count(s) for s in substrings
+        )
+
+    positive = topic_contains(excluded)
+    matcher = re.compile(expression)
+    filters = [
+        topic_contains(course_codes),
+        lambda meeting: not positive(meeting),
+        lambda meeting: bool(matcher.search(meeting.host_email)),
+    ]
+    return lambda meeting: all(map(lambda f: f(meeting), filters))
+
+
+def compiled_filter(course_codes, excluded, expression):
+    return Filter.conjunction([
+        Filter.topic_contains(course_codes),
+        Filter.negation(Filter.topic_contains(excluded)),
+        Filter.host_email_regex(expression),
+    ])
+
+
+def make_meetings(count: int, rng: random.Random):
+    return [
+        types.SimpleNamespace(
+            id=str(rng.randint(10 ** 9, 10 ** 10)),
+            topic='{} (Б{:02}-{:03}, {})'.format(
+                ' '.join(rng.choices(WORDS, k=8)),
+                rng.randint(0, 99),
+                rng.randint(0, 999),
+                rng.randint(2020, 2022),
+            ),
+            host_email='lector{}@phystech.edu'.format(rng.randint(0, 99)),
+        )
+        for _ in range(count)
+    ]
+
+
+def main(count: int = 20000) -> None:
+    rng = random.Random(1)
+    meetings = make_meetings(count, rng)
+    course_codes = [
+        'Б{:02}-{:03}'.format(rng.randint(0, 99), rng.randint(0, 999))
+        for _ in range(40)
+    ]
+    excluded = ['семинар', 'консультация']
+    expression = r'@phystech\.edu$'
+
+    legacy = legacy_filter(course_codes, excluded, expression)
+    compiled = compiled_filter(course_codes, excluded, expression)
+    assert list(filter(legacy, meetings)) == list(filter(compiled, meetings))
+
+    timings = {}
+    for name, predicate in [('legacy', legacy), ('compiled', compiled)]:
+        timings[name] = min(timeit.repeat(
+            lambda: sum(1 for _ in filter(predicate, meetings)),
+            number=1,
+            repeat=5,
+        ))
+        print('{:10} {:8.1f} ms / {} meetings'.format(
+            name, timings[name] * 1000, count))
+    speedup = timings['legacy'] / timings['compiled']
+    print('speedup    {:8.1f}x'.format(speedup))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
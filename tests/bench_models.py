@@ -0,0 +1,115 @@
+"""Listing page parsing: validated models against `MeetingSummary'
+
+`summary' is what `list' keeps, `summary+raw' what listings for
+`download', `plan' and `watch' keep until meetings are validated
+
+Run as `python -m tests.bench_models [MEETINGS]`
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from lectorium_zoom_pull.models import (
+    AccountsRecordingsResponse,
+    MeetingSummary,
+)
+
+
+def make_listing(count: int) -> bytes:
+    def recording_file(idx: int, file_type: str, extension: str) -> dict:
+        return {
+            'id': f'file-{idx}-{file_type}',
+            'meeting_id': f'uuid-{idx}==',
+            'recording_start': '2021-11-01T10:53:01Z',
+            'recording_end': '2021-11-01T12:20:00Z',
+            'file_type': file_type,
+            'file_extension': extension,
+            'file_size': 1234567890,
+            'play_url': f'https://zoom.us/rec/play/{idx}-{file_type}',
+            'download_url': f'https://zoom.us/rec/download/{idx}-{file_type}',
+            'status': 'completed',
+            'recording_type': 'shared_screen_with_speaker_view',
+        }
+
+    meetings = [
+        {
+            'uuid': f'uuid-{idx}==',
+            'id': 80000000000 + idx,
+            'account_id': 'account',
+            'host_id': 'host',
+            'host_email': 'lector@phystech.edu',
+            'topic': f'Алгоритмы и структуры данных, лекция {idx}',
+            'type': 8,
+            'start_time': '2021-11-01T10:53:01Z',
+            'timezone': 'Europe/Moscow',
+            'duration': 87,
+            'total_size': 1300000000,
+            'recording_count': 3,
+            'share_url': f'https://zoom.us/rec/share/{idx}',
+            'recording_files': [
+                recording_file(idx, 'MP4', 'MP4'),
+                recording_file(idx, 'M4A', 'M4A'),
+                recording_file(idx, 'CHAT', 'TXT'),
+            ],
+        }
+        for idx in range(count)
+    ]
+    return json.dumps({
+        'from': '2021-11-01',
+        'to': '2021-11-30',
+        'page_size': count,
+        'total_records': count,
+        'next_page_token': '',
+        'meetings': meetings,
+    }).encode()
+
+
+def validated(body: bytes) -> list:
+    return AccountsRecordingsResponse(**json.loads(body.decode())).meetings
+
+
+def summaries(body: bytes) -> list:
+    return [
+        MeetingSummary(m, keep_raw=False)
+        for m in json.loads(body)['meetings']
+    ]
+
+
+def summaries_with_raw(body: bytes) -> list:
+    return [MeetingSummary(m) for m in json.loads(body)['meetings']]
+
+
+def measure_time(parse, body: bytes) -> float:
+    started = time.perf_counter()
+    parse(body)
+    return time.perf_counter() - started
+
+
+def measure_memory(parse, body: bytes):
+    """Return value: bytes retained by parsed models, peak while parsing"""
+    tracemalloc.start()
+    parsed = parse(body)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del parsed
+    return retained, peak
+
+
+def main(count: int = 10000) -> None:
+    body = make_listing(count)
+    print('{} meetings, {:.1f} MiB of JSON'.format(count, len(body) / 2 ** 20))
+    parsers = [
+        ('validated', validated),
+        ('summary', summaries),
+        ('summary+raw', summaries_with_raw),
+    ]
+    for name, parse in parsers:
+        elapsed = min(measure_time(parse, body) for _ in range(3))
+        retained, peak = measure_memory(parse, body)
+        print('{:12} {:8.1f} ms {:8.1f} MiB retained {:8.1f} MiB peak'.format(
+            name, elapsed * 1000, retained / 2 ** 20, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
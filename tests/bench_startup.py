@@ -0,0 +1,86 @@
+"""CLI startup time of the no-op path, `--help'
+
+Runs `python -X importtime -m lectorium_zoom_pull --help' several times,
+reports wall time, import time of the package and the heaviest imports.
+Exits with status 1 if the median import time exceeds the budget.
+
+Run as `python -m tests.bench_startup [RUNS] [BUDGET_MS]`
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+
+PACKAGE = 'lectorium_zoom_pull'
+
+# self us | cumulative us | indented module name
+_LINE_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_once() -> tuple:
+    """Return value: wall seconds, package import seconds, self times"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', PACKAGE, '--help'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    wall = time.perf_counter() - started
+
+    package_us = 0
+    self_us = {}
+    for line in result.stderr.decode().splitlines():
+        match = _LINE_RE.match(line)
+        if match is None:
+            continue
+        own, cumulative, indent, name = match.groups()
+        self_us[name] = int(own)
+        # Top-level imports of the package, e.g. `lectorium_zoom_pull.cli'
+        if name.startswith(PACKAGE) and len(indent) == 1:
+            package_us += int(cumulative)
+    return wall, package_us / 1e6, self_us
+
+
+def main(runs: int = 10, budget_ms: float = 100) -> None:
+    baseline = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        baseline.append(time.perf_counter() - started)
+
+    walls, imports, heaviest = [], [], {}
+    for _ in range(runs):
+        wall, package_s, self_us = run_once()
+        walls.append(wall)
+        imports.append(package_s)
+        for name, own in self_us.items():
+            heaviest[name] = heaviest.get(name, 0) + own / runs
+
+    import_ms = statistics.median(imports) * 1000
+    print('interpreter  {:6.1f} ms median wall'.format(
+        statistics.median(baseline) * 1000))
+    print('--help       {:6.1f} ms median wall'.format(
+        statistics.median(walls) * 1000))
+    print('{} imports {:6.1f} ms median, budget {:.0f} ms'.format(
+        PACKAGE, import_ms, budget_ms))
+    print('heaviest modules, self time:')
+    for name, own in sorted(heaviest.items(), key=lambda i: -i[1])[:10]:
+        print('  {:8.1f} ms  {}'.format(own / 1000, name))
+
+    if import_ms > budget_ms:
+        print('Over budget', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    # Package sources, when run from repository root
+    os.environ.setdefault('PYTHONPATH', 'src')
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if args else 10,
+        float(args[1]) if len(args) > 1 else 100,
+    )
@@ -0,0 +1,132 @@
+"""End-to-end listing and download against the local Zoom stand-in
+
+Reports listing throughput, time to first meeting, download throughput,
+time to first byte and peak RSS. No network access or credentials needed.
+
+Run as `python -m tests.bench_zoom_api [--meetings N] [--latency S] ...`
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from lectorium_zoom_pull import commands
+from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.meetings import iter_meetings
+
+from tests.fake_zoom import FakeAccount, FakeZoomServer
+
+
+def peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def bench_listing(config: Config) -> None:
+    started = time.monotonic()
+    first_at = None
+    count = 0
+    for _ in iter_meetings(
+            config, '2021-11-01', '2021-12-31', summary=True):
+        if first_at is None:
+            first_at = time.monotonic()
+        count += 1
+    elapsed = time.monotonic() - started
+    print('listing   {:6d} meetings {:8.2f} s {:8.0f} meetings/s '
+          '{:8.1f} ms to first'.format(
+              count, elapsed, count / elapsed,
+              ((first_at or started) - started) * 1000))
+
+
+def bench_download(
+    config: Config,
+    server: FakeZoomServer,
+    meetings: int,
+    jobs: int,
+    segments: int,
+    order: str,
+) -> None:
+    uuids = {m['uuid'] for m in server.account.meetings[:meetings]}
+    total = sum(
+        server.account.files[rfile['id']]['size']
+        for m in server.account.meetings[:meetings]
+        for rfile in m['recording_files']
+    )
+    with tempfile.TemporaryDirectory() as downloads_dir:
+        started = time.monotonic()
+        server.first_byte_at = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            failures = commands.download_records(
+                config,
+                '2021-11-01',
+                '2021-12-31',
+                lambda meeting: meeting.uuid in uuids,
+                downloads_dir,
+                trash_after_download=False,
+                csv_log_path=os.path.join(downloads_dir, 'log.csv'),
+                csv_paths_relative_to=downloads_dir,
+                jobs=jobs,
+                segments=segments,
+                order=order,
+            )
+        elapsed = time.monotonic() - started
+    first_byte = (server.first_byte_at or started) - started
+    print('download  {:6d} meetings {:8.2f} s {:8.1f} MiB/s '
+          '{:8.1f} ms to first byte, {} failed'.format(
+              meetings, elapsed, total / 2 ** 20 / elapsed,
+              first_byte * 1000, failures))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--meetings', type=int, default=3000)
+    parser.add_argument('--file-size', type=int, default=32 << 20)
+    parser.add_argument('--download-meetings', type=int, default=10)
+    parser.add_argument('--jobs', type=int, default=4)
+    parser.add_argument('--segments', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--bandwidth-limit', default='')
+    parser.add_argument('--order', default='listing')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    account = FakeAccount(args.meetings, args.file_size, days=61)
+    server = FakeZoomServer(
+        account,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        drop_rate=args.drop_rate,
+    ).start()
+    config = Config(
+        account_id='fake-account',
+        api_key='k' * 32,
+        api_secret='s' * 32,
+        api_base_url=server.base_url + '/v2',
+        rate_limit_list=1000,
+        rate_limit_download=1000,
+        retry_backoff=0.01,
+        segment_threshold=1 << 20,
+        bandwidth_limit=args.bandwidth_limit,
+    )
+    try:
+        bench_listing(config)
+        bench_download(
+            config, server, args.download_meetings, args.jobs, args.segments,
+            args.order)
+    finally:
+        server.stop()
+    print('requests  {}'.format(', '.join(
+        f'{name}={count}' for name, count in sorted(server.counters.items()))))
+    print('peak RSS  {:.1f} MiB'.format(peak_rss_mib()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+"""Local stand-in for Zoom Cloud Recordings API
+
+Serves a synthetic account under `base_url + '/v2'': paginated listings,
+per-meeting recordings, trash, restore, download redirects and files with
+Range support. Latency, throttling and dropped connections are configurable.
+
+Run standalone as `python -m tests.fake_zoom [--meetings N] ...`
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import typing as tp
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BLOCK_SIZE = 1 << 16
+
+
+def file_content(name: str, offset: int, length: int) -> bytes:
+    """Deterministic pseudo-random bytes of a synthetic file"""
+    block = hashlib.sha256(name.encode()).digest() * (BLOCK_SIZE // 32)
+    start = offset % BLOCK_SIZE
+    repeats = (start + length) // BLOCK_SIZE + 1
+    return (block * repeats)[start:start + length]
+
+
+class FakeAccount:
+    FILE_TYPES = [('MP4', 'MP4'), ('M4A', 'M4A'), ('CHAT', 'TXT')]
+
+    def __init__(
+        self,
+        meetings: int = 100,
+        file_size: int = 1 << 20,
+        first_day: datetime.date = datetime.date(2021, 11, 1),
+        days: int = 30,
+    ):
+        self.meetings = []
+        self.trash = []
+        self.files = {}
+        rng = random.Random(meetings)
+        for idx in range(meetings):
+            start_time = datetime.datetime.combine(
+                first_day + datetime.timedelta(days=idx % days),
+                datetime.time(hour=9 + idx % 10, minute=idx % 60),
+            )
+            self.meetings.append({
+                'uuid': f'uuid-{idx}==',
+                'id': 80000000000 + idx // 3,
+                'account_id': 'fake-account',
+                'host_id': 'fake-host',
+                'host_email': f'lector{idx % 20}@phystech.edu',
+                'topic': 'Course {} lecture {}'.format(
+                    rng.choice('ABCDEF'), idx),
+                'type': 8,
+                'start_time': start_time.isoformat() + 'Z',
+                'duration': 90,
+                'total_size': 0,
+                'recording_count': len(self.FILE_TYPES),
+                'recording_files': [],
+            })
+            for file_type, extension in self.FILE_TYPES:
+                file_id = f'file-{idx}-{file_type}'
+                size = file_size if file_type == 'MP4' else file_size // 8
+                self.files[file_id] = {
+                    'name': f'GMT{start_time:%Y%m%d-%H%M%S}_{idx}.'
+                            + extension.lower(),
+                    'size': size,
+                }
+                self.meetings[-1]['recording_files'].append({
+                    'id': file_id,
+                    'meeting_id': f'uuid-{idx}==',
+                    'recording_start': start_time.isoformat() + 'Z',
+                    'recording_end': '',
+                    'file_type': file_type,
+                    'file_size': size,
+                    'download_url': None,
+                    'status': 'completed',
+                    'recording_type': 'shared_screen_with_speaker_view',
+                })
+                self.meetings[-1]['total_size'] += size
+
+    def set_base_url(self, base_url: str) -> None:
+        for meeting in self.meetings:
+            for rfile in meeting['recording_files']:
+                rfile['download_url'] = '{}/rec/download/{}'.format(
+                    base_url, rfile['id'])
+
+    def find(self, id_or_uuid: str, in_trash: bool = False):
+        source = self.trash if in_trash else self.meetings
+        for meeting in source:
+            if id_or_uuid in (meeting['uuid'], str(meeting['id'])):
+                return meeting
+        return None
+
+
+class FakeZoomServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        account: FakeAccount,
+        port: int = 0,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        drop_rate: float = 0.0,
+        page_size_limit: int = 300,
+    ):
+        super().__init__(('127.0.0.1', port), FakeZoomHandler)
+        self.account = account
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.drop_rate = drop_rate
+        self.page_size_limit = page_size_limit
+        # Next API requests answered with 401, as if the token was revoked
+        self.reject_tokens = 0
+        self.rng = random.Random(0)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.first_byte_at = None
+        self.account.set_base_url(self.base_url)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def chance(self, probability: float) -> bool:
+        with self.lock:
+            return self.rng.random() < probability
+
+    def reject_token(self) -> bool:
+        with self.lock:
+            if self.reject_tokens <= 0:
+                return False
+            self.reject_tokens -= 1
+            return True
+
+    def start(self) -> 'FakeZoomServer':
+        self._thread = threading.Thread(
+            target=self.serve_forever, name='fake-zoom', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+class FakeZoomHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: FakeZoomServer
+
+    ROUTES = [
+        ('GET', r'/v2/accounts/me/recordings', 'list_recordings'),
+        ('GET', r'/v2/meetings/([^/]+)/recordings', 'get_recordings'),
+        ('DELETE', r'/v2/meetings/([^/]+)/recordings', 'trash'),
+        ('PUT', r'/v2/meetings/([^/]+)/recordings/status', 'restore'),
+        ('GET', r'/v2/past_meetings/([^/]+)/instances', 'instances'),
+        ('GET', r'/rec/download/([^/]+)', 'redirect'),
+        ('GET', r'/files/([^/]+)', 'file'),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: tp.Optional[dict] = None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def dispatch(self, method: str):
+        url = urllib.parse.urlparse(self.path)
+        self.query = dict(urllib.parse.parse_qsl(url.query))
+        path = urllib.parse.unquote(urllib.parse.unquote(url.path))
+
+        if self.headers.get('Content-Length'):
+            self.rfile.read(int(self.headers['Content-Length']))
+
+        for route_method, pattern, handler in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self.send_json(404, {'code': 404, 'message': 'No route'})
+
+        self.server.count(handler)
+        if handler != 'file' and self.server.reject_token():
+            self.server.count('unauthorized')
+            return self.send_json(401, {'code': 124, 'message': 'Revoked'})
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if handler != 'file' and self.server.chance(self.server.throttle_rate):
+            self.server.count('throttled')
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        getattr(self, 'do_' + handler)(*match.groups())
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_list_recordings(self):
+        trash = self.query.get('trash') in ('true', 'True')
+        meetings = self.server.account.trash if trash \
+            else self.server.account.meetings
+
+        first = self.query.get('from')
+        last = self.query.get('to')
+        if first and last:
+            meetings = [
+                m for m in meetings
+                if first <= m['start_time'][:10] <= last
+            ]
+
+        page_size = min(
+            int(self.query.get('page_size', 30)),
+            self.server.page_size_limit,
+        )
+        offset = int(self.query.get('next_page_token') or 0)
+        page = meetings[offset:offset + page_size]
+        next_offset = offset + page_size
+        self.send_json(200, {
+            'from': first,
+            'to': last,
+            'page_size': page_size,
+            'total_records': len(meetings),
+            'next_page_token':
+                str(next_offset) if next_offset < len(meetings) else '',
+            'meetings': page,
+        })
+
+    def do_get_recordings(self, id_or_uuid: str):
+        meeting = self.server.account.find(id_or_uuid)
+        if meeting is None:
+            return self.send_json(404, {'code': 3301, 'message': 'Nothing'})
+        meeting = dict(meeting)
+        del meeting['host_email']
+        self.send_json(200, meeting)
+
+    def do_instances(self, meeting_id: str):
+        self.send_json(200, {'meetings': [
+            {'uuid': m['uuid'], 'start_time': m['start_time']}
+            for m in self.server.account.meetings
+            if str(m['id']) == meeting_id
+        ]})
+
+    def do_trash(self, uuid: str):
+        account = self.server.account
+        with self.server.lock:
+            meeting = account.find(uuid)
+            if meeting is None:
+                return self.send_json(404, {'code': 3301})
+            account.meetings.remove(meeting)
+            account.trash.append(meeting)
+        self.send_json(204)
+
+    def do_restore(self, uuid: str):
+        account = self.server.account
+        with self.server.lock:
+            meeting = account.find(uuid, in_trash=True)
+            if meeting is None:
+                return self.send_json(404, {'code': 3301})
+            account.trash.remove(meeting)
+            account.meetings.append(meeting)
+        self.send_json(204)
+
+    def do_redirect(self, file_id: str):
+        if file_id not in self.server.account.files:
+            return self.send_json(404, {'code': 3301})
+        self.send_response(302)
+        self.send_header(
+            'Location', f'{self.server.base_url}/files/{file_id}')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_file(self, file_id: str):
+        rfile = self.server.account.files.get(file_id)
+        if rfile is None:
+            return self.send_json(404, {'code': 3301})
+
+        size = rfile['size']
+        first, last = 0, size - 1
+        range_match = re.fullmatch(
+            r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if range_match:
+            first = int(range_match.group(1))
+            if range_match.group(2):
+                last = min(int(range_match.group(2)), size - 1)
+            if first >= size:
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(last - first + 1))
+        self.end_headers()
+
+        drop_at = None
+        if self.server.chance(self.server.drop_rate):
+            with self.server.lock:
+                drop_at = self.server.rng.randint(first, last)
+
+        offset = first
+        while offset <= last:
+            length = min(BLOCK_SIZE, last + 1 - offset)
+            if drop_at is not None and offset + length > drop_at:
+                self.server.count('dropped')
+                self.wfile.write(file_content(
+                    file_id, offset, drop_at - offset))
+                self.close_connection = True
+                return
+            with self.server.lock:
+                if self.server.first_byte_at is None:
+                    self.server.first_byte_at = time.monotonic()
+            self.wfile.write(file_content(file_id, offset, length))
+            offset += length
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--meetings', type=int, default=100)
+    parser.add_argument('--file-size', type=int, default=1 << 20)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeZoomServer(
+        FakeAccount(args.meetings, args.file_size),
+        port=args.port,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        drop_rate=args.drop_rate,
+    )
+    print(f'Serving at {server.base_url}/v2', flush=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
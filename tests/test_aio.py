@@ -0,0 +1,80 @@
+import asyncio
+
+import unittest
+
+from lectorium_zoom_pull.aio import AsyncZoomClient, run_sync
+from lectorium_zoom_pull.config import Config
+
+
+class TestAsyncZoomClient(unittest.TestCase):
+    @classmethod
+    def make_client(cls) -> AsyncZoomClient:
+        config = Config(
+            account_id='account',
+            api_key='k' * 32,
+            api_secret='s' * 32,
+        )
+        return AsyncZoomClient(config, 2)
+
+    @classmethod
+    def test_map_ordered(cls):
+        client = cls.make_client()
+
+        async def double(item: int) -> int:
+            await asyncio.sleep(0.01 * (5 - item))
+            if item == 3:
+                raise ValueError(item)
+            return item * 2
+
+        async def collect():
+            return [
+                (item, result, type(error))
+                async for item, result, error
+                in client.map_ordered(double, range(5))
+            ]
+
+        try:
+            assert run_sync(collect()) == [
+                (0, 0, type(None)),
+                (1, 2, type(None)),
+                (2, 4, type(None)),
+                (3, None, ValueError),
+                (4, 8, type(None)),
+            ]
+        finally:
+            client.close()
+
+    @classmethod
+    def test_failing_items(cls):
+        client = cls.make_client()
+        started, cancelled = [], []
+
+        def listing():
+            yield from range(3)
+            raise RuntimeError('Listing failed')
+
+        async def slow(item: int) -> int:
+            started.append(item)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(item)
+                raise
+            return item
+
+        async def consume():
+            async for _ in client.map_ordered(slow, listing()):
+                pass
+
+        try:
+            run_sync(consume())
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError('Expected RuntimeError')
+        finally:
+            client.close()
+
+        # Calls in flight were cancelled and awaited, not abandoned
+        assert started == [0, 1, 2]
+        assert cancelled == [0, 1, 2]
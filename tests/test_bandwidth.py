@@ -0,0 +1,48 @@
+import datetime
+import time
+
+import unittest
+
+from lectorium_zoom_pull.bandwidth import (
+    BandwidthLimiter,
+    RateSchedule,
+    parse_rate,
+)
+
+
+class TestBandwidth(unittest.TestCase):
+    @classmethod
+    def test_parse_rate(cls):
+        assert parse_rate('500') == 500
+        assert parse_rate('500K') == 500 * 1024
+        assert parse_rate('1.5MiB') == 1.5 * 2 ** 20
+        assert parse_rate('2g') == 2 * 2 ** 30
+        assert parse_rate('0') is None
+        assert parse_rate('unlimited') is None
+        try:
+            parse_rate('fast')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('Expected ValueError')
+
+    @classmethod
+    def test_schedule(cls):
+        schedule = RateSchedule('09:00-19:00=10M, 22:00-06:00=0, 50M')
+        at = datetime.time
+        assert schedule.rate_at(at(12, 0)) == 10 * 2 ** 20
+        assert schedule.rate_at(at(19, 0)) == 50 * 2 ** 20
+        assert schedule.rate_at(at(23, 30)) is None
+        assert schedule.rate_at(at(5, 59)) is None
+        assert schedule.rate_at(at(6, 0)) == 50 * 2 ** 20
+        assert not RateSchedule('')
+        assert RateSchedule('00:00-23:59=1M').rate_at(at(23, 59)) is None
+
+    @classmethod
+    def test_limiter(cls):
+        limiter = BandwidthLimiter(RateSchedule('1M'))
+        started = time.monotonic()
+        for _ in range(3):
+            # First MiB is the allowed burst
+            limiter.consume(2 ** 19)
+        assert 0.4 < time.monotonic() - started < 1.0
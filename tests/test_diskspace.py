@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+import unittest
+
+from lectorium_zoom_pull.diskspace import fit_batch, free_space
+from lectorium_zoom_pull.progress import parse_size
+from lectorium_zoom_pull.transfer import reserve_blocks
+
+
+class TestDiskSpace(unittest.TestCase):
+    @classmethod
+    def test_parse_size(cls):
+        assert parse_size('512') == 512
+        assert parse_size('1.5G') == 1.5 * 2 ** 30
+        assert parse_size(' 2 TiB ') == 2 * 2 ** 40
+
+    @classmethod
+    def test_fit_batch(cls):
+        batch = [('a', 40), ('b', 70), ('c', 20), ('d', 0)]
+        assert fit_batch(batch, 130, 'refuse') == (['a', 'b', 'c', 'd'], [])
+        assert fit_batch(batch, 100, 'trim') == (['a', 'c', 'd'], ['b'])
+        assert fit_batch(batch, -5, 'trim') == (['d'], ['a', 'b', 'c'])
+        assert fit_batch(batch, 0, 'ignore') == (['a', 'b', 'c', 'd'], [])
+        for policy in ['refuse', 'shrink']:
+            try:
+                fit_batch(batch, 100, policy)
+            except (RuntimeError, ValueError):
+                pass
+            else:
+                raise AssertionError('Expected an error')
+
+    @classmethod
+    def test_free_space(cls):
+        with tempfile.TemporaryDirectory() as root:
+            missing = os.path.join(root, 'not', 'created')
+            assert free_space(missing) > 0
+            assert not os.path.exists(missing)
+
+    @classmethod
+    def test_reserve_blocks(cls):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'file.part')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 4096)
+                f.flush()
+                if not reserve_blocks(f.fileno(), 4096, 1 << 20):
+                    raise unittest.SkipTest('fallocate is not supported')
+            # Size still tells how much has been written
+            assert os.path.getsize(path) == 4096
+            assert os.stat(path).st_blocks * 512 >= 1 << 20
@@ -0,0 +1,233 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+import unittest
+import unittest.mock
+
+import requests
+
+from lectorium_zoom_pull import commands
+from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.diskspace import free_space
+from lectorium_zoom_pull.filters import Filter
+from lectorium_zoom_pull.plan import Plan
+from lectorium_zoom_pull.selection import selection_rules
+from lectorium_zoom_pull.state import DownloadState
+from lectorium_zoom_pull.transfer import PART_SUFFIX, stream_to_file
+
+from tests.fake_zoom import FakeAccount, FakeZoomServer, file_content
+
+
+class TestDownload(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.downloads_dir = self._tmp.name
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.stop()
+        self._tmp.cleanup()
+
+    def serve(
+        self,
+        meetings: int = 12,
+        file_size: int = 1 << 16,
+        **options,
+    ) -> FakeAccount:
+        """Start a fake server for this test, `options' go to it"""
+        self.account = FakeAccount(meetings=meetings, file_size=file_size)
+        self.server = FakeZoomServer(self.account, **options).start()
+        self.config = Config(
+            account_id='fake-account',
+            api_key='k' * 32,
+            api_secret='s' * 32,
+            api_base_url=self.server.base_url + '/v2',
+            retry_backoff=0.01,
+            max_retries=10,
+            segment_threshold=1 << 18,
+        )
+        return self.account
+
+    def download(self, **kwargs) -> int:
+        kwargs.setdefault(
+            'meeting_filter', Filter.topic_regex(r'.* lecture [0-5]$'))
+        kwargs.setdefault('trash_after_download', True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return commands.download_records(
+                self.config,
+                '2021-11-01',
+                '2021-11-30',
+                downloads_dir=self.downloads_dir,
+                csv_log_path=os.path.join(self.downloads_dir, 'log.csv'),
+                csv_paths_relative_to=self.downloads_dir,
+                jobs=2,
+                segments=3,
+                **kwargs,
+            )
+
+    def csv_lines(self) -> int:
+        with open(os.path.join(self.downloads_dir, 'log.csv')) as f:
+            return len(f.readlines())
+
+    def test_flaky_server(self):
+        account = self.serve(
+            file_size=1 << 20, throttle_rate=0.2, drop_rate=0.3)
+        assert self.download() == 0
+
+        downloaded = {}
+        for root, _, names in os.walk(self.downloads_dir):
+            for name in names:
+                downloaded[name] = os.path.join(root, name)
+        for idx in range(6):
+            for file_type in ['MP4', 'M4A', 'CHAT']:
+                file_id = f'file-{idx}-{file_type}'
+                with open(downloaded[file_id], 'rb') as f:
+                    content = f.read()
+                size = account.files[file_id]['size']
+                assert content == file_content(file_id, 0, size)
+        assert not [n for n in downloaded if n.endswith('.part')]
+
+        assert self.csv_lines() == 6 * 3
+        assert len(account.trash) == 6
+        assert len(account.meetings) == 6
+
+        # Trashed meetings are no longer listed
+        assert self.download() == 0
+        assert len(account.trash) == 6
+
+        # Digests computed while streaming, segmented or not
+        records = DownloadState(self.downloads_dir).downloaded()
+        assert len(records) == 6 * 3
+        for record in records:
+            size = account.files[record.id]['size']
+            content = file_content(record.id, 0, size)
+            digest = hashlib.sha256(content).hexdigest()
+            assert record.sha256 == digest
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert commands.verify_downloads(self.downloads_dir) == 0
+            with open(downloaded['file-3-MP4'], 'r+b') as f:
+                f.write(b'?')
+            os.remove(downloaded['file-4-CHAT'])
+            failures = commands.verify_downloads(self.downloads_dir, jobs=2)
+            assert failures == 2
+
+    def test_not_enough_space(self):
+        account = self.serve()
+        with self.assertRaises(RuntimeError):
+            self.download(space_reserve='1000000T')
+        assert not [
+            name for name in os.listdir(self.downloads_dir)
+            if not name.startswith('.lzp-state')
+        ]
+
+        failures = self.download(
+            space_policy='trim', space_reserve='1000000T')
+        assert failures == 0
+        assert self.server.counters.get('redirect', 0) == 0
+        assert len(account.trash) == 0
+
+        assert self.download() == 0
+        assert len(account.trash) == 6
+
+    def test_space_checked_in_batches(self):
+        account = self.serve()
+        meeting_size = account.meetings[0]['total_size']
+        # Room for 3 meetings, the second batch does not fit
+        reserve = free_space(self.downloads_dir) - 3.5 * meeting_size
+        with unittest.mock.patch.object(commands, 'SPACE_CHECK_BATCH', 2), \
+                self.assertRaises(RuntimeError):
+            self.download(space_reserve=str(reserve))
+        assert self.csv_lines() == 2 * 3
+        assert len(account.trash) == 2
+
+    def test_plan(self):
+        account = self.serve()
+        plan_path = os.path.join(self.downloads_dir, 'plan.json')
+        # Throughput of this run makes an ETA
+        assert self.download(
+            meeting_filter=Filter.topic_regex(r'.* lecture 0$'),
+            trash_after_download=False) == 0
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            commands.plan_records(
+                self.config,
+                '2021-11-01',
+                '2021-11-30',
+                Filter.topic_regex(r'.* lecture [0-5]$'),
+                self.downloads_dir,
+                plan_path,
+            )
+        lines = output.getvalue().splitlines()
+        cells = [
+            [cell.strip() for cell in line.split(' | ')]
+            for line in lines[1:5]
+        ]
+        assert cells[0][:3] == ['2021-11', 'CHAT', '6']
+        assert cells[3][:3] == ['Total', '', '18']
+        assert cells[3][4] == '3'
+        assert lines[5].startswith('Meetings: 6, to download: 15')
+        assert ', ETA 0:00:' in lines[5]
+        assert self.server.counters.get('redirect', 0) == 3
+
+        plan = Plan.read(plan_path)
+        assert len(plan.meetings) == 6
+        assert len(plan.files) == 6 * 3
+        assert sum(f.present for f in plan.files) == 3
+
+        listings = self.server.counters['list_recordings']
+        assert self.download(meeting_filter=None, from_plan=plan_path) == 0
+        assert self.server.counters['list_recordings'] == listings
+        assert self.server.counters['redirect'] == 6 * 3
+        assert len(account.trash) == 6
+
+    def test_file_selection(self):
+        account = self.serve()
+        rules_path = os.path.join(self.downloads_dir, 'rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump([
+                {'topic_regex': 'lecture [01]$', 'file_types': 'M4A'},
+            ], f)
+        rules = selection_rules(max_size='32K', rules_path=rules_path)
+        assert self.download(rules=rules) == 0
+
+        assert self.server.counters['redirect'] == 2 + 4 * 2
+        names = [
+            name
+            for _, _, names in os.walk(self.downloads_dir)
+            for name in names
+        ]
+        assert not [name for name in names if name.endswith('.mp4')]
+        assert len(account.trash) == 6
+
+    def test_nothing_selected(self):
+        account = self.serve()
+        assert self.download(rules=selection_rules(min_size='1G')) == 0
+        assert self.server.counters.get('redirect', 0) == 0
+        assert len(account.trash) == 0
+
+    def test_resumed_bytes(self):
+        account = self.serve(meetings=1)
+        file_id = 'file-0-MP4'
+        size = account.files[file_id]['size']
+        path = os.path.join(self.downloads_dir, file_id)
+        with open(path + PART_SUFFIX, 'wb') as f:
+            f.write(file_content(file_id, 0, size // 4))
+
+        downloaded = stream_to_file(
+            requests.Session(),
+            f'{self.server.base_url}/files/{file_id}',
+            path,
+            file_id,
+            expected_size=size,
+        )
+        assert downloaded.size == size
+        assert downloaded.transferred == size - size // 4
+        with open(path, 'rb') as f:
+            assert f.read() == file_content(file_id, 0, size)
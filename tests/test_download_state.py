@@ -0,0 +1,150 @@
+import os.path
+import sqlite3
+import tempfile
+
+import unittest
+
+from lectorium_zoom_pull.downloads import PathManager
+from lectorium_zoom_pull.meetings import pending_files
+from lectorium_zoom_pull.models import Meeting
+from lectorium_zoom_pull.state import DownloadState, FileState
+
+
+class TestDownloadState(unittest.TestCase):
+    @classmethod
+    def make_meeting(cls) -> Meeting:
+        rfile = {
+            'meeting_id': 'uuid-1',
+            'recording_start': '2021-11-01T10:53:01Z',
+            'file_type': 'MP4',
+            'status': 'completed',
+        }
+        return Meeting(
+            uuid='uuid-1',
+            id='id-1',
+            account_id='',
+            host_id='',
+            host_email='',
+            topic='',
+            start_time='2021-11-01T10:53:01Z',
+            total_size=0,
+            type=0,
+            recording_count=2,
+            recording_files=[
+                dict(rfile, id='file-1'),
+                dict(rfile, id='file-2'),
+            ],
+        )
+
+    @classmethod
+    def test_lifecycle(cls):
+        meeting = cls.make_meeting()
+        first, second = meeting.recording_files
+
+        with tempfile.TemporaryDirectory() as downloads_dir:
+            state = DownloadState(downloads_dir)
+            state.update(meeting, [first, second], FileState.PENDING)
+            state.update(meeting, [first], FileState.IN_PROGRESS)
+            state.update(
+                meeting,
+                [first],
+                FileState.COMPLETE,
+                abs_path=os.path.join(downloads_dir, 'dir', 'file.mp4'),
+                size=100,
+            )
+            state.close()
+
+            # Reopened journal keeps states, paths and sizes
+            state = DownloadState(downloads_dir)
+            files = state.meeting_files(meeting)
+            assert files['file-1'].state == FileState.COMPLETE
+            assert files['file-1'].path == os.path.join('dir', 'file.mp4')
+            assert files['file-1'].size == 100
+            assert [f.id for f in state.unfinished()] == ['file-2']
+
+            state.mark_trashed(meeting)
+            files = state.meeting_files(meeting)
+            assert files['file-1'].state == FileState.TRASHED
+            assert files['file-2'].state == FileState.PENDING
+            state.close()
+
+    @classmethod
+    def test_verify_on_disk(cls):
+        meeting = cls.make_meeting()
+        first, second = meeting.recording_files
+
+        with tempfile.TemporaryDirectory() as downloads_dir:
+            abs_path = os.path.join(downloads_dir, 'file.mp4')
+            with open(abs_path, 'wb') as f:
+                f.write(b'0' * 100)
+
+            state = DownloadState(downloads_dir)
+            state.update(
+                meeting, [first], FileState.COMPLETE,
+                abs_path=abs_path, size=100)
+            # Adopted without a path by older versions
+            state.update(meeting, [second], FileState.COMPLETE)
+
+            assert state.verify_on_disk(meeting, [first, second]) == [
+                'file-1 has no checksum', 'file-2 has no recorded path']
+            state.set_digest('file-1', 'digest')
+            assert state.verify_on_disk(meeting, [first]) == []
+
+            with open(abs_path, 'ab') as f:
+                f.write(b'0')
+            assert state.verify_on_disk(meeting, [first]) == [
+                'file-1 has 101 bytes, expected 100']
+            state.close()
+
+    @classmethod
+    def test_legacy_adoption(cls):
+        meeting = cls.make_meeting()
+        first, second = meeting.recording_files
+        first.file_size, second.file_size = 100, 200
+        for rfile in meeting.recording_files:
+            rfile.download_url = 'https://zoom.us/rec/download/' + rfile.id
+
+        with tempfile.TemporaryDirectory() as downloads_dir:
+            path_manager = PathManager(downloads_dir)
+            state = DownloadState(downloads_dir)
+            subdir = path_manager.mkdir_for(meeting)
+            with open(os.path.join(subdir, 'b.m4a'), 'wb') as f:
+                f.write(b'0' * 200)
+
+            # A file is missing, the directory is not adopted
+            assert pending_files(path_manager, state, meeting) == [
+                first, second]
+            assert path_manager.legacy_files(meeting, [100, 200]) is None
+
+            with open(os.path.join(subdir, 'a.mp4'), 'wb') as f:
+                f.write(b'0' * 100)
+            assert pending_files(path_manager, state, meeting) == []
+            assert path_manager.legacy_files(meeting, [200, 100]) == [
+                os.path.join(subdir, 'b.m4a'),
+                os.path.join(subdir, 'a.mp4'),
+            ]
+            state.close()
+
+    @classmethod
+    def test_schema_upgrade(cls):
+        with tempfile.TemporaryDirectory() as downloads_dir:
+            db = sqlite3.connect(
+                os.path.join(downloads_dir, DownloadState.FILENAME))
+            db.execute(
+                'CREATE TABLE files (id TEXT PRIMARY KEY, meeting_uuid TEXT, '
+                'meeting_id TEXT, state TEXT, path TEXT, size INTEGER, '
+                'updated_at TEXT)')
+            db.execute(
+                "INSERT INTO files VALUES ('file-1', 'uuid-1', 'id-1', "
+                "'complete', 'file.mp4', 100, '')")
+            db.commit()
+            db.close()
+
+            state = DownloadState(downloads_dir)
+            meeting = cls.make_meeting()
+            assert state.meeting_files(meeting)['file-1'].sha256 is None
+            state.update(
+                meeting, meeting.recording_files[:1], FileState.COMPLETE,
+                sha256='digest')
+            assert state.meeting_files(meeting)['file-1'].sha256 == 'digest'
+            state.close()
@@ -58,3 +58,42 @@ class TestMeetingFilters(unittest.TestCase):
         assert not filt(blocked_meeting)
         assert neg_filt(blocked_meeting)
         assert neg_filt(blocked_meeting)
+
+    @classmethod
+    def test_host_email_contains_is_case_sensitive(cls):
+        filt = Filter.host_email_contains(['@phystech', 'lector'])
+
+        assert filt(cls.make_meeting(host_email='lector@mipt.ru'))
+        assert filt(cls.make_meeting(host_email='x@phystech.edu'))
+        assert not filt(cls.make_meeting(host_email='x@PHYSTECH.edu'))
+
+    @classmethod
+    def test_conjunction(cls):
+        filt = Filter.conjunction([
+            Filter.topic_regex(r'\(\d{4}\)$'),
+            Filter.negation(Filter.topic_contains(['семинар'])),
+            Filter.topic_contains(['Б05', 'Б06']),
+            Filter.meeting_id_in({'id-1'}),
+        ])
+
+        assert filt(cls.make_meeting(id='id-1', topic='Лекция б05 (2021)'))
+        assert not filt(cls.make_meeting(id='id-2', topic='Лекция Б05 (2021)'))
+        assert not filt(cls.make_meeting(id='id-1', topic='СЕМИНАР Б05 2021'))
+        assert not filt(cls.make_meeting(id='id-1', topic='Лекция Б07 (2021)'))
+        assert not filt(cls.make_meeting(id='id-1', topic='Лекция Б05 2021'))
+
+    @classmethod
+    def test_required_meeting_ids(cls):
+        by_id = Filter.meeting_id_in({'id-1', 'id-2'})
+        by_topic = Filter.topic_contains(['pea'])
+
+        assert by_id.required_meeting_ids() == {'id-1', 'id-2'}
+        assert by_topic.required_meeting_ids() is None
+        assert Filter.negation(by_id).required_meeting_ids() is None
+
+        filt = Filter.conjunction([by_topic, by_id])
+        assert filt.required_meeting_ids() == {'id-1', 'id-2'}
+        filt = Filter.conjunction([
+            by_id, Filter.meeting_id_in({'id-2', 'id-3'})])
+        assert filt.required_meeting_ids() == {'id-2'}
+        assert Filter.conjunction([by_topic]).required_meeting_ids() is None
@@ -0,0 +1,78 @@
+import datetime
+
+import unittest
+
+from lectorium_zoom_pull.cache import MetadataCache, _missing_ranges
+from lectorium_zoom_pull.models import Meeting
+
+
+def d(day: int, month: int = 11) -> datetime.date:
+    return datetime.date(2021, month, day)
+
+
+class TestMetadataCache(unittest.TestCase):
+    @classmethod
+    def make_meeting(cls, **kwargs) -> Meeting:
+        m = {
+            'uuid': 'uuid-1',
+            'id': 'id-1',
+            'account_id': 'account',
+            'host_id': '',
+            'host_email': '',
+            'topic': 'topic',
+            'start_time': '2021-11-01T10:53:01Z',
+            'duration': None,
+            'total_size': 0,
+            'type': 0,
+            'recording_count': 1,
+            'recording_files': [{
+                'id': 'file-1',
+                'meeting_id': 'uuid-1',
+                'recording_start': '2021-11-01T10:53:01Z',
+                'file_type': 'MP4',
+                'file_size': 100,
+                'download_url': 'https://zoom.us/rec/download/file-1',
+                'status': 'completed',
+            }],
+        }
+        m.update(kwargs)
+        return Meeting(**m)
+
+    @classmethod
+    def test_missing_ranges(cls):
+        assert _missing_ranges((d(1), d(30)), None, 2) == \
+            ([(d(1), d(30))], (d(1), d(30)))
+
+        # Extending forward refreshes last days of synced range
+        assert _missing_ranges((d(1), d(30)), (d(1), d(20)), 2) == \
+            ([(d(18), d(30))], (d(1), d(30)))
+
+        # Extending backward
+        assert _missing_ranges((d(5), d(10)), (d(8), d(20)), 2) == \
+            ([(d(5), d(7))], (d(5), d(20)))
+
+        # Old days are not requested again
+        assert _missing_ranges((d(1), d(10)), (d(1), d(20)), 2) == \
+            ([], (d(1), d(20)))
+
+        # Disjoint range replaces synced one
+        assert _missing_ranges((d(1, 12), d(5, 12)), (d(1), d(20)), 2) == \
+            ([(d(1, 12), d(5, 12))], (d(1, 12), d(5, 12)))
+
+    @classmethod
+    def test_roundtrip(cls):
+        cache = MetadataCache(':memory:')
+        meeting = cls.make_meeting()
+        cache.replace_range('account', d(1), d(30), [meeting])
+
+        assert list(cache.meetings('account', d(1), d(1))) == [meeting]
+        assert list(cache.meetings('account', d(2), d(30))) == []
+        assert list(cache.meetings('other', d(1), d(30))) == []
+
+        # Refetched range drops meetings that are gone from listing
+        cache.replace_range('account', d(1), d(2), [])
+        assert list(cache.meetings('account', d(1), d(30))) == []
+
+        cache.store(meeting)
+        cache.forget(meeting)
+        assert list(cache.meetings('account', d(1), d(30))) == []
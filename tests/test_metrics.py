@@ -0,0 +1,67 @@
+import json
+import os.path
+import tempfile
+
+import unittest
+
+from lectorium_zoom_pull.metrics import RECENT_FILES, Histogram, RunMetrics
+
+
+class TestMetrics(unittest.TestCase):
+    @classmethod
+    def test_histogram(cls):
+        histogram = Histogram([0.1, 1.0])
+        for value in [0.05, 0.5, 5.0]:
+            histogram.observe(value)
+        assert histogram.to_dict() == {
+            'count': 3,
+            'sum': 5.55,
+            'buckets': {'0.1': 1, '1.0': 2},
+        }
+
+    @classmethod
+    def test_export(cls):
+        run = RunMetrics()
+        run.observe_request('list', 0.2, '200')
+        run.observe_request('list', 0.3, '429')
+        run.observe_file('id / file.mp4', 'MP4', 1000, 2.0)
+        run.count('meetings', 2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'run.json')
+            prom_path = os.path.join(tmp, 'lzp.prom')
+            run.write_json(json_path)
+            run.write_prometheus(prom_path)
+            assert sorted(os.listdir(tmp)) == ['lzp.prom', 'run.json']
+
+            with open(json_path) as f:
+                summary = json.load(f)
+            assert summary['requests']['list']['statuses'] == {
+                '200': 1, '429': 1}
+            assert summary['files']['bytes'] == 1000
+            assert summary['counters'] == {'meetings': 2}
+
+            with open(prom_path) as f:
+                lines = f.read().splitlines()
+            assert 'lzp_request_duration_seconds_bucket' \
+                '{category="list",le="0.25"} 1' in lines
+            assert 'lzp_request_duration_seconds_count' \
+                '{category="list"} 2' in lines
+            assert 'lzp_responses_total' \
+                '{category="list",status="429"} 1' in lines
+            assert 'lzp_file_bytes_total 1000' in lines
+            assert 'lzp_meetings_total 2' in lines
+
+    @classmethod
+    def test_long_run(cls):
+        run = RunMetrics()
+        for idx in range(RECENT_FILES * 3):
+            run.observe_file(f'id / file-{idx}.mp4', 'MP4', 10, 0.5)
+
+        assert run.transferred() == (RECENT_FILES * 3, RECENT_FILES * 30)
+        files = run.summary()['files']
+        assert files['count'] == RECENT_FILES * 3
+        assert files['transfer_seconds'] == RECENT_FILES * 1.5
+        assert len(files['items']) == RECENT_FILES
+        assert files['items'][-1]['label'] == \
+            f'id / file-{RECENT_FILES * 3 - 1}.mp4'
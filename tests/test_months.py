@@ -0,0 +1,49 @@
+import datetime
+
+import unittest
+
+from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.meetings import iter_meetings
+from lectorium_zoom_pull.months import month_windows
+
+
+class TestMonthWindows(unittest.TestCase):
+    @classmethod
+    def test_within_month(cls):
+        d1 = datetime.date(2021, 11, 3)
+        d2 = datetime.date(2021, 11, 20)
+        assert month_windows(d1, d2) == [(d1, d2)]
+        assert month_windows(d1, d1) == [(d1, d1)]
+
+    @classmethod
+    def test_semester(cls):
+        windows = month_windows(
+            datetime.date(2021, 9, 15),
+            datetime.date(2022, 1, 10),
+        )
+        assert windows == [
+            (datetime.date(2021, 9, 15), datetime.date(2021, 9, 30)),
+            (datetime.date(2021, 10, 1), datetime.date(2021, 10, 31)),
+            (datetime.date(2021, 11, 1), datetime.date(2021, 11, 30)),
+            (datetime.date(2021, 12, 1), datetime.date(2021, 12, 31)),
+            (datetime.date(2022, 1, 1), datetime.date(2022, 1, 10)),
+        ]
+
+    @classmethod
+    def test_empty(cls):
+        d1 = datetime.date(2021, 11, 3)
+        d2 = datetime.date(2021, 11, 2)
+        assert month_windows(d1, d2) == []
+
+    @classmethod
+    def test_empty_listing(cls):
+        # Nothing to list, no requests are sent
+        config = Config(
+            account_id='fake-account',
+            api_key='k' * 32,
+            api_secret='s' * 32,
+            api_base_url='http://127.0.0.1:9/v2',
+        )
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        assert list(iter_meetings(config, '2021-11-03', '2021-11-02')) == []
+        assert list(iter_meetings(config, tomorrow.isoformat())) == []
@@ -0,0 +1,36 @@
+import threading
+
+import unittest
+
+from lectorium_zoom_pull.ordering import PriorityExecutor
+
+
+class TestPriorityExecutor(unittest.TestCase):
+    @classmethod
+    def test_order(cls):
+        started = []
+        gate = threading.Event()
+
+        with PriorityExecutor(max_workers=1) as executor:
+            # Occupies the only worker until everything else is queued
+            executor.submit(gate.wait)
+            futures = [
+                executor.submit_ordered(priority, started.append, name)
+                for priority, name in [
+                    ((2, 'MP4'), 'video'),
+                    ((0, 'M4A'), 'audio'),
+                    ((1, 'CHAT'), 'chat'),
+                    ((0, 'M4A'), 'audio 2'),
+                ]
+            ]
+            gate.set()
+            for future in futures:
+                future.result()
+
+        assert started == ['audio', 'audio 2', 'chat', 'video']
+
+    @classmethod
+    def test_exception(cls):
+        with PriorityExecutor(max_workers=2) as executor:
+            future = executor.submit(int, 'not a number')
+        assert isinstance(future.exception(), ValueError)
@@ -0,0 +1,68 @@
+import unittest
+
+import requests
+
+from lectorium_zoom_pull.ratelimit import (
+    QuotaExceeded,
+    RequestScheduler,
+    retry_after,
+)
+
+
+class FakeConfig:
+    rate_limit_list = 1000
+    rate_limit_trash = 1000
+    rate_limit_download = 1000
+    max_retries = 3
+    retry_backoff = 0.001
+    retry_backoff_max = 0.01
+
+
+def make_response(status_code: int, **headers) -> requests.Response:
+    rsp = requests.Response()
+    rsp.status_code = status_code
+    rsp.headers.update(headers)
+    return rsp
+
+
+class TestRequestScheduler(unittest.TestCase):
+    @classmethod
+    def test_retry_after(cls):
+        assert retry_after(make_response(429, **{'Retry-After': '3'})) == 3
+        assert retry_after(make_response(429)) is None
+        past = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        assert retry_after(make_response(429, **{'Retry-After': past})) == 0
+
+    @classmethod
+    def test_retries_throttled(cls):
+        scheduler = RequestScheduler(FakeConfig())
+        responses = iter([
+            make_response(429, **{'Retry-After': '0.01'}),
+            make_response(503),
+            make_response(200),
+        ])
+        rsp = scheduler.send('list', lambda: next(responses))
+        assert rsp.status_code == 200
+        assert scheduler.requests['list'] == 3
+        assert scheduler.retries['list'] == 2
+        assert scheduler.throttled_seconds['list'] > 0
+
+    @classmethod
+    def test_gives_up(cls):
+        scheduler = RequestScheduler(FakeConfig())
+        rsp = scheduler.send('trash', lambda: make_response(500))
+        assert rsp.status_code == 500
+        assert scheduler.requests['trash'] == FakeConfig.max_retries + 1
+
+    def test_daily_limit(self):
+        scheduler = RequestScheduler(FakeConfig())
+        daily = make_response(429, **{
+            'Retry-After': '3600',
+            'X-RateLimit-Type': 'Daily-limit',
+        })
+        with self.assertRaises(QuotaExceeded):
+            scheduler.send('list', lambda: daily)
+        with self.assertRaises(QuotaExceeded):
+            scheduler.send('list', lambda: make_response(200))
+        assert scheduler.requests['list'] == 1
+        assert scheduler.send('trash', lambda: make_response(200))
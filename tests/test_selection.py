@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+
+import unittest
+
+from lectorium_zoom_pull.models import FileType, Meeting
+from lectorium_zoom_pull.meetings import downloadable_files
+from lectorium_zoom_pull.selection import (
+    FileSelection,
+    SelectionRules,
+    selection_rules,
+)
+
+from tests.fake_zoom import FakeAccount
+
+
+class TestSelection(unittest.TestCase):
+    @classmethod
+    def make_meetings(cls) -> list:
+        account = FakeAccount(meetings=3, file_size=1 << 20)
+        account.set_base_url('http://127.0.0.1')
+        return [Meeting(**meeting) for meeting in account.meetings]
+
+    @classmethod
+    def types(cls, files) -> set:
+        return {rfile.file_type.value for rfile in files}
+
+    @classmethod
+    def test_default(cls):
+        meeting = cls.make_meetings()[0]
+        assert cls.types(downloadable_files(meeting)) == {'MP4', 'M4A', 'CHAT'}
+        meeting.recording_files[0].status = 'processing'
+        assert len(downloadable_files(meeting)) == 2
+
+    @classmethod
+    def test_file_selection(cls):
+        meeting = cls.make_meetings()[0]
+        rules = selection_rules(file_types='m4a, chat')
+        assert cls.types(downloadable_files(meeting, rules)) == {'M4A', 'CHAT'}
+
+        rules = selection_rules(max_size='512K')
+        assert cls.types(downloadable_files(meeting, rules)) == {'M4A', 'CHAT'}
+        rules = selection_rules(min_size='1M')
+        assert cls.types(downloadable_files(meeting, rules)) == {'MP4'}
+
+        rules = selection_rules(recording_types='audio_only')
+        assert downloadable_files(meeting, rules) == []
+        rules = selection_rules(
+            recording_types='shared_screen_with_speaker_view,audio_only')
+        assert len(downloadable_files(meeting, rules)) == 3
+
+        selection = FileSelection.parse(
+            file_types=['TRANSCRIPT'], base=FileSelection(max_size=10))
+        assert selection.file_types == {FileType.TRANSCRIPT}
+        assert selection.max_size == 10
+        try:
+            selection_rules(file_types='MP4,MKV')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('Expected ValueError')
+
+    @classmethod
+    def test_rules(cls):
+        meetings = cls.make_meetings()
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'rules.json')
+            with open(path, 'w') as f:
+                json.dump([
+                    {'topic_regex': 'lecture 0$', 'file_types': 'M4A'},
+                    {'meeting_ids': [meetings[1].id], 'min_size': '1M'},
+                ], f)
+            rules = selection_rules(file_types='MP4,M4A', rules_path=path)
+            assert isinstance(rules, SelectionRules)
+
+            # Instances share the meeting id, the first matching rule wins
+            assert cls.types(downloadable_files(meetings[0], rules)) == {'M4A'}
+            assert cls.types(downloadable_files(meetings[1], rules)) == {'MP4'}
+            rules.rules.pop()
+            assert cls.types(downloadable_files(meetings[1], rules)) == \
+                {'MP4', 'M4A'}
+
+            with open(path, 'w') as f:
+                json.dump([{'file_types': 'M4A'}], f)
+            try:
+                selection_rules(rules_path=path)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError('Expected ValueError')
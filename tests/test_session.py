@@ -0,0 +1,47 @@
+import unittest
+import unittest.mock
+
+from lectorium_zoom_pull import auth
+from lectorium_zoom_pull.config import Config
+from lectorium_zoom_pull.meetings import iter_meetings
+from lectorium_zoom_pull.session import api_session
+
+from tests.fake_zoom import FakeAccount, FakeZoomServer
+
+
+class TestZoomSession(unittest.TestCase):
+    def setUp(self):
+        self.account = FakeAccount(meetings=3, file_size=1 << 10)
+        self.server = FakeZoomServer(self.account).start()
+        self.config = Config(
+            account_id='fake-account',
+            api_key='k' * 32,
+            api_secret='s' * 32,
+            api_base_url=self.server.base_url + '/v2',
+        )
+
+    def tearDown(self):
+        self.server.stop()
+
+    def list_meetings(self) -> list:
+        return list(iter_meetings(self.config, '2021-11-01', '2021-11-30'))
+
+    def test_revoked_token(self):
+        assert len(self.list_meetings()) == 3
+
+        with unittest.mock.patch.object(
+                auth, 'jwt_access_token',
+                wraps=auth.jwt_access_token) as issue:
+            # Cached token is rejected once, a new one is issued
+            self.server.reject_tokens = 1
+            assert len(self.list_meetings()) == 3
+            assert self.server.counters['unauthorized'] == 1
+            assert issue.call_count == 1
+
+            # Rejected again, retried only once
+            self.server.reject_tokens = 2
+            rsp = api_session(self.config).get(
+                '/accounts/me/recordings', category='list')
+            assert rsp.status_code == 401
+            assert self.server.counters['unauthorized'] == 3
+            assert issue.call_count == 2
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import unittest
+
+import lectorium_zoom_pull
+
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(lectorium_zoom_pull.__file__))
+
+CHECK = '''
+import sys
+from lectorium_zoom_pull.cli import cli
+try:
+    cli(['--help'])
+except SystemExit as e:
+    assert e.code == 0, e.code
+heavy = ['requests', 'pydantic', 'jwt', 'lectorium_zoom_pull.commands']
+print(' '.join(name for name in heavy if name in sys.modules))
+'''
+
+
+class TestStartup(unittest.TestCase):
+    @classmethod
+    def test_help_skips_heavy_imports(cls):
+        env = {
+            name: value for name, value in os.environ.items()
+            if not name.upper().startswith('LZP_')
+        }
+        env['PYTHONPATH'] = PACKAGE_ROOT
+        result = subprocess.run(
+            [sys.executable, '-c', CHECK],
+            env=env,
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+        imported = result.stdout.decode().splitlines()[-1]
+        assert imported == '', f'Imported for --help: {imported}'
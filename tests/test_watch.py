@@ -0,0 +1,138 @@
+import contextlib
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import unittest
+
+from lectorium_zoom_pull import commands
+from lectorium_zoom_pull.config import Config
+
+from tests.fake_zoom import FakeAccount, FakeZoomServer
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.mkdtemp()
+        self.downloads_dir = os.path.join(self._tmp, 'downloads')
+        os.mkdir(self.downloads_dir)
+        self.first_day = datetime.date.today() - datetime.timedelta(days=3)
+        self.account = FakeAccount(
+            meetings=4, file_size=1 << 16, first_day=self.first_day)
+        # Still being processed by Zoom
+        self.processing = self.account.meetings[3]
+        for rfile in self.processing['recording_files']:
+            rfile['status'] = 'processing'
+        self.server = None
+        self.watcher = None
+        self.stop = threading.Event()
+        self.result = []
+
+    def tearDown(self):
+        self.stop.set()
+        if self.watcher is not None:
+            self.watcher.join(10)
+        if self.server is not None:
+            self.server.stop()
+        shutil.rmtree(self._tmp)
+
+    def serve(self, **options) -> None:
+        self.server = FakeZoomServer(self.account, **options).start()
+        self.config = Config(
+            account_id='fake-account',
+            api_key='k' * 32,
+            api_secret='s' * 32,
+            api_base_url=self.server.base_url + '/v2',
+        )
+
+    def watch(self, **kwargs) -> None:
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.result.append(commands.watch_records(
+                    self.config,
+                    lambda meeting: True,
+                    self.downloads_dir,
+                    trash_after_download=True,
+                    csv_log_path=os.path.join(self._tmp, 'log.csv'),
+                    csv_paths_relative_to=self.downloads_dir,
+                    since=self.first_day.isoformat(),
+                    interval=0.1,
+                    stop=self.stop,
+                    **kwargs,
+                ))
+
+        self.watcher = threading.Thread(target=run)
+        self.watcher.start()
+
+    def stop_watching(self) -> None:
+        self.stop.set()
+        self.watcher.join(10)
+        assert not self.watcher.is_alive()
+
+    @classmethod
+    def wait_for(cls, condition) -> None:
+        deadline = time.monotonic() + 10
+        while not condition():
+            assert time.monotonic() < deadline, 'Timed out'
+            time.sleep(0.05)
+
+    def test_new_recordings(self):
+        self.serve()
+        self.watch()
+
+        self.wait_for(lambda: len(self.account.trash) == 3)
+        assert self.processing in self.account.meetings
+
+        for rfile in self.processing['recording_files']:
+            rfile['status'] = 'completed'
+        self.wait_for(lambda: len(self.account.trash) == 4)
+
+        self.stop_watching()
+        assert self.result == [0]
+        assert self.server.counters['redirect'] == 4 * 3
+
+    def test_stale_pending(self):
+        # Fails on every attempt
+        del self.account.files['file-0-MP4']
+        self.serve()
+
+        with self.assertLogs(level='WARNING') as logs:
+            self.watch(max_attempts=2)
+
+            self.wait_for(lambda: len(self.account.trash) == 2)
+            # Deleted while Zoom was still processing it
+            self.account.meetings.remove(self.processing)
+            self.wait_for(lambda: any(
+                'uuid-3== is no longer listed' in line
+                for line in logs.output))
+            self.wait_for(lambda: any(
+                'Giving up on uuid-0==' in line for line in logs.output))
+            redirects = self.server.counters['redirect']
+            time.sleep(0.5)
+            assert self.server.counters['redirect'] == redirects
+
+            self.stop_watching()
+
+        # The meeting given up on is still reported
+        assert self.result == [1]
+        assert redirects == 2 * 3 + 2 + 2
+
+    def test_metrics_per_poll(self):
+        self.serve()
+        metrics_json = os.path.join(self._tmp, 'metrics.json')
+        self.config = self.config.copy(update=dict(metrics_json=metrics_json))
+        self.watch()
+
+        # Written while still watching, not only at exit
+        self.wait_for(lambda: len(self.account.trash) == 3)
+        self.wait_for(lambda: os.path.exists(metrics_json))
+        assert self.watcher.is_alive()
+        with open(metrics_json) as f:
+            assert json.load(f)['files']['count'] >= 3 * 3
+
+        self.stop_watching()